@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+# Anytime 3x3 solver for callers with a latency budget
+# A valid solution is ready almost at once and is then shortened until the deadline, in stages:
+#   CFOP        solver.solve, a few tens of milliseconds
+#   two-phase   twophase.Search run again and again with a length limit one below the best so far,
+#               each run stopping at its first solution within the limit or at the deadline. Phase 2 is
+#               kept short, see MAX_PHASE2
+# solutions() yields every shorter solution as it is found and solve() blocks until the deadline and
+# returns the last one. The first solution is always returned, even past the deadline. Tables are built
+# on first use, call getTables() beforehand so that no deadline pays for it
+
+import time
+
+import cross
+import f2l
+import solver
+import twophase
+from cubie import MOVE_NAMES, CubieCube
+
+# Longest phase 2 of the two-phase runs. Skipping deeper ones finds the first short solutions sooner,
+# which matters more here than the few solutions they would find
+MAX_PHASE2 = 12
+
+
+def getTables():
+    # Loads the tables of every stage, building whichever are missing
+    for slot in range(4):
+        cross.slotTables(slot)
+    f2l.insertionTable()
+    solver.ollTable()
+    solver.pllTable()
+    twophase.getTables()
+
+
+def solutions(cube, deadline_ms=1000):
+    # Yields solutions of a 3x3 cube.Cube, each shorter than the one before, as lists of moves such as ['R', "U'", 'F2']
+    # deadline_ms (float) : milliseconds from the call after which no more solutions are looked for
+    deadline = time.time() + deadline_ms / 1000
+    state = CubieCube.fromCube(cube)
+    twophase.verify(state.corners, state.edges)
+    best = solver.solve(cube)
+    yield best
+    while best and time.time() < deadline:
+        # Stops at the first solution shorter than best, or returns whatever it has (maybe None) at the deadline
+        moves = twophase.Search(state.corners, state.edges, len(best) - 1, deadline, anySolution=False, maxPhase2=MAX_PHASE2).run()
+        if moves is None or len(moves) >= len(best):
+            return
+        best = [MOVE_NAMES[move] for move in moves]
+        yield best
+
+
+def solve(cube, deadline_ms=1000):
+    # Shortest solution found by the deadline as a list of moves, see solutions
+    for moves in solutions(cube, deadline_ms):
+        best = moves
+    return best
+
+
+if __name__ == '__main__':
+    from cube import CubeBatch
+    getTables()
+    batch = CubeBatch(3, 1)
+    batch.scramble(30, seed=1)
+    t0 = time.time()
+    for moves in solutions(batch.getCube(0), 1000):
+        print(str(len(moves)) + ' moves at ' + str(round((time.time() - t0) * 1000)) + ' ms: ' + ' '.join(moves))
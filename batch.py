@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+# Streaming batch solver
+# Reads one scramble per line, in the notation of cube.parseMoves, from files or stdin, solves them
+# in a pool of worker processes and writes one JSON line per scramble:
+#   {"index": 0, "scramble": "R U F2 ...", "solution": "D' L2 ...", "moves": 19, "seconds": 0.412}
+#   {"index": 1, "scramble": "R X", "error": "ValueError: Unknown move X"}
+# index counts the non-blank input lines from 0. Only a bounded number of scrambles are in flight at
+# once, so input of any length streams through in constant memory. Example:
+#   python batch.py scrambles.txt --solver twophase --processes 8 > solutions.jsonl
+
+import argparse
+import collections
+import concurrent.futures
+import fileinput
+import importlib
+import json
+import os
+import sys
+import time
+
+from cache import SolutionCache
+from cube import Cube
+
+# Solver name -> (module, cube size). Each module has solve(cube, ...), getTables, tableHandles and useTables
+SOLVERS = {
+    'twophase': ('twophase', 3),
+    'optimal': ('optimal', 3),
+    '2x2': ('solver2x2', 2),
+}
+
+# Solve function, cube size and solve keyword arguments of a worker process
+workerSolver = None
+
+
+def initWorker(solver, options, handles, cachePath=None):
+    # Pool initializer, attaches the tables loaded by the parent instead of loading them again
+    global workerSolver
+    module = importlib.import_module(SOLVERS[solver][0])
+    if handles is not None:
+        module.useTables(handles)
+    solve = module.solve if cachePath is None else SolutionCache(module.solve, solver, cachePath).solve
+    workerSolver = (solve, SOLVERS[solver][1], options)
+
+
+def solveScramble(index, scramble):
+    # Result dict of one scramble, see the top of the file
+    solve, size, options = workerSolver
+    result = {'index': index, 'scramble': scramble}
+    try:
+        cube = Cube(size)
+        cube.apply(scramble)
+        t0 = time.perf_counter()
+        solution = solve(cube, **options)
+        seconds = time.perf_counter() - t0
+    except Exception as error:
+        # Any failure is reported on its line so that one bad scramble or solver bug cannot end the stream
+        result['error'] = type(error).__name__ + ': ' + str(error)
+        return result
+    if solution is None:
+        result['error'] = 'No solution found within the limits'
+    else:
+        result['solution'] = ' '.join(solution)
+        result['moves'] = len(solution)
+    result['seconds'] = round(seconds, 6)
+    return result
+
+
+def solveStream(lines, solver='twophase', processes=None, inFlight=None, ordered=True, cachePath=None, **options):
+    # Solves scrambles as they are read, yielding result dicts
+    # lines (iterable of str) : one scramble per line, blank lines are skipped
+    # solver (str) : key of SOLVERS
+    # processes (int) : worker processes, all cores if None. With 1 everything runs in this process
+    # inFlight (int) : most scrambles submitted but not yet yielded, 4 per process if None
+    # ordered (bool) : yield results in input order, otherwise as soon as each is solved
+    # cachePath (str) : SQLite file of a SolutionCache shared by the workers, None to always solve
+    # options : keyword arguments for the solver's solve, such as maxLength or timeout
+    module = importlib.import_module(SOLVERS[solver][0])
+    module.getTables()
+    scrambles = (line.strip() for line in lines)
+    scrambles = enumerate(scramble for scramble in scrambles if scramble)
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        initWorker(solver, options, None, cachePath)
+        for index, scramble in scrambles:
+            yield solveScramble(index, scramble)
+        return
+
+    inFlight = inFlight or 4 * processes
+    with concurrent.futures.ProcessPoolExecutor(processes, initializer=initWorker, initargs=(solver, options, module.tableHandles(), cachePath)) as executor:
+        pending = collections.deque() if ordered else set()
+        for index, scramble in scrambles:
+            future = executor.submit(solveScramble, index, scramble)
+            if ordered:
+                pending.append(future)
+            else:
+                pending.add(future)
+            while len(pending) >= inFlight:
+                yield from finished(pending, ordered)
+        while pending:
+            yield from finished(pending, ordered)
+
+
+def finished(pending, ordered):
+    # Waits for the oldest future, or any future when unordered, and yields the results now available
+    if ordered:
+        yield pending.popleft().result()
+        while pending and pending[0].done():
+            yield pending.popleft().result()
+    else:
+        done, notDone = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            yield future.result()
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Solve scrambles from files or stdin, writing one JSON line per solve')
+    parser.add_argument('files', nargs='*', help='files with one scramble per line, stdin if none or -')
+    parser.add_argument('--solver', choices=sorted(SOLVERS), default='twophase')
+    parser.add_argument('--processes', type=int, help='worker processes, all cores by default')
+    parser.add_argument('--in-flight', type=int, help='most scrambles queued at once, 4 per process by default')
+    parser.add_argument('--unordered', action='store_true', help='write results as they finish instead of in input order')
+    parser.add_argument('--max-length', type=int, help='solution length limit passed to the solver')
+    parser.add_argument('--timeout', type=float, help='seconds per solve passed to the solver')
+    parser.add_argument('--cache', help='SQLite file caching solutions by canonical state across runs')
+    parser.add_argument('--summary', action='store_true', help='print counts, mean length and throughput to stderr at the end')
+    args = parser.parse_args(arguments)
+
+    if args.solver == '2x2' and (args.max_length is not None or args.timeout is not None):
+        parser.error('the 2x2 solver is always optimal and takes no --max-length or --timeout')
+    options = {}
+    if args.max_length is not None:
+        options['maxLength'] = args.max_length
+    if args.timeout is not None:
+        options['timeout'] = args.timeout
+    t0 = time.time()
+    solved, failed, totalMoves = 0, 0, 0
+    with fileinput.input(args.files) as lines:
+        for result in solveStream(lines, args.solver, args.processes, args.in_flight, not args.unordered, args.cache, **options):
+            sys.stdout.write(json.dumps(result) + '\n')
+            sys.stdout.flush()
+            if 'error' in result:
+                failed += 1
+            else:
+                solved += 1
+                totalMoves += result['moves']
+    if args.summary:
+        seconds = time.time() - t0
+        sys.stderr.write(str(solved) + ' solved, ' + str(failed) + ' failed in ' + str(round(seconds, 2)) + ' s')
+        if solved:
+            sys.stderr.write(', mean ' + str(round(totalMoves / solved, 2)) + ' moves, ' + str(round(solved / seconds, 1)) + ' cubes/s')
+        sys.stderr.write('\n')
+
+
+if __name__ == '__main__':
+    main()
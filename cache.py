@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+# Solution cache keyed by canonical state
+# Solutions are stored for the canonical conjugate of each state (see symmetry.py), so a position and
+# its 47 mirror and rotation images share one entry, and a hit is turned back into moves for the
+# query with symmetry.transformMoves. Entries live in two tiers:
+#   memory   an LRU dict of the most recently used entries
+#   disk     an optional SQLite file, shared by every process and run opening the same path
+# Example:
+#   import twophase
+#   cache = SolutionCache(twophase.solve, 'twophase', 'solutions.sqlite')
+#   moves = cache.solve(cube, timeout=1.0)
+
+import collections
+import sqlite3
+import time
+
+from cube import formatMoves, parseMoves
+from symmetry import INVERSE_SYMMETRY, canonicalize, transformMoves
+
+# Disk hits whose use time is kept in memory before being written in one transaction
+TOUCH_BATCH = 256
+# Share of diskItems deleted at once when the disk tier goes over it, so eviction runs once per that many stores
+EVICT_FRACTION = 1/16
+
+
+class SolutionCache:
+    def __init__(self, solve, name, path=None, memoryItems=4096, diskItems=None, colors=False):
+        # solve (function) : solver called on a miss as solve(cube, **options), returning a list of moves
+        #   in the cube's orientation frame, or None when it found no solution
+        # name (str) : solver name, entries of different solvers sharing a file are kept apart. So are those solved
+        #   with different options, which are added to the name
+        # path (str) : SQLite file of the disk tier, None for memory only
+        # memoryItems (int) : most entries kept in memory
+        # diskItems (int) : most entries of this name kept on disk, whatever their options, the least recently used
+        #   are deleted in batches past it, see evict. None for no limit
+        # colors (bool) : also share entries between states differing only by a relabeling of the colors,
+        #   such as the same scramble seen after a whole cube rotation
+        self.solver, self.name = solve, name
+        self.memoryItems, self.diskItems = memoryItems, diskItems
+        self.colors = colors
+        self.memory = collections.OrderedDict()
+        self.memoryHits, self.diskHits, self.misses = 0, 0, 0
+        # Use times of disk hits not written yet, see flush
+        self.touched = {}
+        self.connection = None
+        if path is not None:
+            self.connection = sqlite3.connect(path, timeout=60)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            with self.connection:
+                columns = [row[1] for row in self.connection.execute('PRAGMA table_info(solutions)')]
+                if columns and 'options' not in columns:
+                    # Files written before the options had their own column only hold cached solutions
+                    self.connection.execute('DROP TABLE solutions')
+                self.connection.execute('CREATE TABLE IF NOT EXISTS solutions (name TEXT, options TEXT, key BLOB, solution TEXT, used REAL, '
+                                        'PRIMARY KEY (name, options, key))')
+                self.connection.execute('CREATE INDEX IF NOT EXISTS solutionsUsed ON solutions (name, used)')
+        # Rows of this name on disk as of the last count, plus those inserted since
+        self.diskRows = len(self) if self.connection is not None and diskItems is not None else 0
+
+    def __len__(self):
+        # Entries on disk with any options, or in memory without a disk tier
+        if self.connection is None:
+            return len(self.memory)
+        return self.connection.execute('SELECT COUNT(*) FROM solutions WHERE name = ?', (self.name,)).fetchone()[0]
+
+    def optionsName(self, options):
+        # Value of the options column for solutions found with options, such as "maxLength=20"
+        return ' '.join(name + '=' + repr(value) for name, value in sorted(options.items()))
+
+    def stats(self):
+        lookups = self.memoryHits + self.diskHits + self.misses
+        return {'memoryHits': self.memoryHits, 'diskHits': self.diskHits, 'misses': self.misses,
+                'hitRate': (self.memoryHits + self.diskHits) / lookups if lookups else 0.0}
+
+    def remember(self, key, solution):
+        self.memory[key] = solution
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memoryItems:
+            self.memory.popitem(last=False)
+
+    def lookup(self, options, key):
+        # Canonical solution string of a key, or None
+        # options (str) : see optionsName
+        solution = self.memory.get((options, key))
+        if solution is not None:
+            self.memory.move_to_end((options, key))
+            self.memoryHits += 1
+            return solution
+        if self.connection is not None:
+            row = self.connection.execute('SELECT solution FROM solutions WHERE name = ? AND options = ? AND key = ?',
+                                          (self.name, options, key)).fetchone()
+            if row is not None:
+                # The use time only orders eviction, so it is written later with others instead of in a transaction per hit
+                self.touched[(options, key)] = time.time()
+                if len(self.touched) >= TOUCH_BATCH:
+                    with self.connection:
+                        self.flush()
+                self.remember((options, key), row[0])
+                self.diskHits += 1
+                return row[0]
+        self.misses += 1
+        return None
+
+    def flush(self):
+        # Writes the use times of the disk hits since the last flush, inside the caller's transaction
+        self.connection.executemany('UPDATE solutions SET used = ? WHERE name = ? AND options = ? AND key = ?',
+                                    [(used, self.name, options, key) for (options, key), used in self.touched.items()])
+        self.touched.clear()
+
+    def store(self, options, key, solution):
+        self.remember((options, key), solution)
+        if self.connection is None:
+            return
+        with self.connection:
+            self.flush()
+            self.connection.execute('INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?)', (self.name, options, key, solution, time.time()))
+            if self.diskItems is not None:
+                self.diskRows += 1
+                if self.diskRows > self.diskItems:
+                    self.evict()
+
+    def evict(self):
+        # Deletes the least recently used rows of this name once there are more than diskItems, down to
+        # EVICT_FRACTION of diskItems below it. The count is only an upper bound between evictions, since
+        # replaced rows and other processes' deletions are not tracked, so it is taken again first
+        self.diskRows = len(self)
+        if self.diskRows <= self.diskItems:
+            return
+        excess = self.diskRows - self.diskItems + int(self.diskItems * EVICT_FRACTION)
+        self.connection.execute('DELETE FROM solutions WHERE rowid IN (SELECT rowid FROM solutions WHERE name = ? ORDER BY used LIMIT ?)',
+                                (self.name, excess))
+        self.diskRows = max(0, self.diskRows - excess)
+
+    def solve(self, cube, **options):
+        # The cached solution of cube mapped back to its symmetry, solving it with the solver on a miss
+        # options : passed on to the solver, solutions found with other options are not used
+        optionsName = self.optionsName(options)
+        keys, symmetries = canonicalize(cube.orientedNet()[None], self.colors)
+        key, symmetry = keys[0].tobytes(), int(symmetries[0])
+        solution = self.lookup(optionsName, key)
+        if solution is not None:
+            return formatMoves(transformMoves(parseMoves(solution), INVERSE_SYMMETRY[symmetry])).split()
+        moves = self.solver(cube, **options)
+        if moves is not None:
+            self.store(optionsName, key, formatMoves(transformMoves(parseMoves(moves), symmetry)))
+        return moves
+
+    def close(self):
+        # Writes the pending use times and closes the disk tier
+        if self.connection is not None:
+            if self.touched:
+                with self.connection:
+                    self.flush()
+            self.connection.close()
+            self.connection = None
+
+
+if __name__ == '__main__':
+    import os
+    import random
+    import tempfile
+    import solver
+    from cube import Cube
+    rng = random.Random(1)
+    scrambles = [[(rng.randrange(6), rng.choice((-1, 1, 2)), 0, 1) for move in range(25)] for i in range(200)]
+    path = os.path.join(tempfile.mkdtemp(), 'solutions.sqlite')
+    # New scrambles, then their mirror and rotation images, then those again from a fresh cache on the same file
+    for rounds, name in enumerate(['new', 'symmetric', 'from disk']):
+        cache = SolutionCache(solver.solve, 'cfop', path) if rounds != 1 else cache
+        t0 = time.time()
+        for scramble in scrambles:
+            cube = Cube(3)
+            cube.apply(scramble if rounds == 0 else transformMoves(scramble, rng.randrange(48)))
+            moves = cache.solve(cube)
+            cube.apply(moves)
+            assert cube.isSolved()
+        print(name + ': ' + str(round((time.time() - t0) / len(scrambles) * 1000, 3)) + ' ms per solve, ' + str(cache.stats()))
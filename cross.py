@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+
+# Optimal cross and X-cross for the first CFOP step
+# The cross is the four D edges, 12*11*10*9 placements * 2^4 flips = 190,080 states, small enough to
+# keep the exact distance of every state, so an optimal cross is found by walking down that table.
+# An X-cross also solves the corner and edge of one F2L slot. It is found with IDA*, the heuristic
+# being the largest of the cross distance and two nibble packed pruning tables of each slot:
+#   cross + slot edge     12*11*10*9*8 * 2^5 = 3,041,280 states
+#   cross + slot corner   190,080 * 24 = 4,561,920 states
+# The X-cross tables are only built (and kept on disk by tables.py) once an X-cross is asked for. A search
+# can solve several slots at once, which f2l.py uses to insert a pair while keeping the solved ones.
+# Edge groups are numbered like optimal.edgeCoordinate: partial permutation rank of the slots * 2^k + flips,
+# and pieces are given as in solver.py, the state of each corner (slot*3 + twist) and edge (slot*2 + flip)
+
+import time
+
+import numpy as np
+
+import tables
+import twophase
+from cubie import MOVE_NAMES, CubieCube, edgeGroupMoveTable, partialPermutationRank, pieceMoveTables
+
+# Bump when a coordinate or table layout changes so old files are rebuilt
+TABLE_VERSION = 1
+
+CROSS_EDGES = [4, 5, 6, 7]
+# F2L slot i holds corner SLOT_CORNERS[i] and edge SLOT_EDGES[i]: FR, FL, BL, BR
+SLOT_CORNERS = [4, 5, 6, 7]
+SLOT_EDGES = [8, 9, 10, 11]
+
+NUM_CROSS_POSITIONS = 11880
+NUM_CROSS_STATES = NUM_CROSS_POSITIONS * 16
+NUM_PAIR_EDGE_STATES = 95040 * 32
+NUM_PAIR_CORNER_STATES = NUM_CROSS_STATES * 24
+
+
+def groupCoordinate(edges, pieces):
+    # positions*2^k + flips of the k given edge pieces, bit i of the flips belonging to pieces[i]
+    # edges (list) : state of each of the 12 edge pieces
+    slots = np.array([edges[piece] // 2 for piece in pieces])
+    flips = np.array([edges[piece] % 2 for piece in pieces])
+    return int(partialPermutationRank(slots, 12)) * (1 << len(pieces)) + int(flips @ (1 << np.arange(len(pieces))))
+
+
+def crossMoveTable():
+    # Cross state after each move for every cross state, shaped (NUM_CROSS_STATES, 18)
+    states = np.arange(NUM_CROSS_STATES, dtype=np.uint32)
+    return edgeGroupMoveTable(4)[states >> 4] ^ (states & 15)[:, np.newaxis]
+
+
+class GroupSpace:
+    # Neighbours of edge group states for generateDistances, see cubie.edgeGroupMoveTable
+    def __init__(self, groupMoves, k):
+        self.groupMoves = np.asarray(groupMoves, dtype=np.int64)
+        self.k = k
+
+    def __call__(self, states):
+        return self.groupMoves[states >> self.k] ^ (states & ((1 << self.k) - 1))[:, np.newaxis]
+
+
+SOLVED_EDGES = list(range(0, 24, 2))
+SOLVED_CORNERS = list(range(0, 24, 3))
+SOLVED_CROSS = groupCoordinate(SOLVED_EDGES, CROSS_EDGES)
+
+
+def pairEdgePieces(slot):
+    return CROSS_EDGES + [SLOT_EDGES[slot]]
+
+
+def buildPairEdgeDistances(slot, groupMoves):
+    return tables.generateDistances(NUM_PAIR_EDGE_STATES, GroupSpace(groupMoves, 5), groupCoordinate(SOLVED_EDGES, pairEdgePieces(slot)))
+
+
+def buildPairCornerDistances(slot, crossMoves, cornerMoves):
+    # States are cross*24 + corner
+    return tables.generateDistances(NUM_PAIR_CORNER_STATES, tables.ProductSpace(crossMoves, cornerMoves), SOLVED_CROSS * 24 + SOLVED_CORNERS[SLOT_CORNERS[slot]])
+
+
+loadedTables = None
+
+
+def getTables():
+    # Loads the cross move and distance tables, building whichever are missing
+    global loadedTables
+    if loadedTables is None:
+        t = {}
+        t['crossMoves'] = tables.loadTable('cross_moves', crossMoveTable)
+        t['cornerMoves'] = pieceMoveTables()[0]
+        t['cornerMoveLists'] = t['cornerMoves'].tolist()
+        t['crossDistances'] = tables.loadTable('cross_distances', lambda: tables.breadthFirst(NUM_CROSS_STATES, tables.ProductSpace(t['crossMoves']), SOLVED_CROSS))
+        t['slots'] = [None] * 4
+        loadedTables = t
+    return loadedTables
+
+
+def slotTables(slot):
+    # (pair edge moves, pair edge distances, pair corner distances) of the X-cross of an F2L slot, loaded on first use
+    t = getTables()
+    if t['slots'][slot] is None:
+        pairEdgeMoves = tables.loadTable('xcross_edge_moves', lambda: edgeGroupMoveTable(5))
+        pairEdgeDistances = tables.loadDistances('xcross_edges' + str(slot), TABLE_VERSION, NUM_PAIR_EDGE_STATES, lambda: buildPairEdgeDistances(slot, pairEdgeMoves))
+        pairCornerDistances = tables.loadDistances('xcross_corners' + str(slot), TABLE_VERSION, NUM_PAIR_CORNER_STATES, lambda: buildPairCornerDistances(slot, t['crossMoves'], t['cornerMoves']))
+        t['slots'][slot] = (pairEdgeMoves, pairEdgeDistances, pairCornerDistances)
+    return t['slots'][slot]
+
+
+class Search:
+    def __init__(self, corners, edges, slots=(), maxLength=12):
+        # corners, edges (lists) : state of each piece as in solver.py
+        # slots (tuple) : F2L slots solved along with the cross, () for the cross alone and (slot,) for an X-cross
+        # maxLength (int) : longest solution looked for
+        t = getTables()
+        self.crossMoves = twophase.flatView(t['crossMoves'])
+        self.crossDistances = twophase.flatView(t['crossDistances'])
+        self.cross = groupCoordinate(edges, CROSS_EDGES)
+        self.slots = tuple(slots)
+        self.cornerMoves = t['cornerMoveLists']
+        self.pairEdgeMoves = None
+        self.pairEdgeDistances, self.pairCornerDistances = [], []
+        for slot in self.slots:
+            pairEdgeMoves, pairEdgeDistances, pairCornerDistances = slotTables(slot)
+            self.pairEdgeMoves = twophase.flatView(pairEdgeMoves)
+            self.pairEdgeDistances.append(twophase.flatView(pairEdgeDistances))
+            self.pairCornerDistances.append(twophase.flatView(pairCornerDistances))
+        self.pairEdges = tuple(groupCoordinate(edges, pairEdgePieces(slot)) for slot in self.slots)
+        self.solvedPairEdges = tuple(groupCoordinate(SOLVED_EDGES, pairEdgePieces(slot)) for slot in self.slots)
+        self.corners = tuple(corners[SLOT_CORNERS[slot]] for slot in self.slots)
+        self.solvedCorners = tuple(SOLVED_CORNERS[SLOT_CORNERS[slot]] for slot in self.slots)
+        self.maxLength = maxLength
+        self.path = []
+        self.solution = None
+        self.nodes = 0
+        self.seconds = 0.0
+
+    def heuristic(self, cross, pairEdges, corners):
+        distance = self.crossDistances[cross]
+        for edgeDistances, cornerDistances, edges, corner in zip(self.pairEdgeDistances, self.pairCornerDistances, pairEdges, corners):
+            pairCorner = cross * 24 + corner
+            distance = max(distance, (edgeDistances[edges >> 1] >> ((edges & 1) << 2)) & 15,
+                           (cornerDistances[pairCorner >> 1] >> ((pairCorner & 1) << 2)) & 15)
+        return distance
+
+    def run(self):
+        # Returns an optimal solution as a list of move indices, or None if there is none within maxLength moves
+        t0 = time.time()
+        if not self.slots:
+            self.solution = self.descend()
+        else:
+            for depth in range(self.heuristic(self.cross, self.pairEdges, self.corners), self.maxLength+1):
+                if self.search(self.cross, self.pairEdges, self.corners, depth, -1):
+                    self.solution = list(self.path)
+                    break
+        self.seconds = time.time() - t0
+        return self.solution
+
+    def descend(self):
+        # The cross distances are exact, so the first move getting one closer is always on an optimal path
+        cross, path = self.cross, []
+        if self.crossDistances[cross] > self.maxLength:
+            return None
+        while self.crossDistances[cross]:
+            self.nodes += 1
+            distance = self.crossDistances[cross]
+            row = cross * 18
+            move = next(move for move in range(18) if self.crossDistances[self.crossMoves[row + move]] < distance)
+            cross = self.crossMoves[row + move]
+            path.append(move)
+        return path
+
+    def search(self, cross, pairEdges, corners, depth, lastFace):
+        # IDA* over the cross and slots, returns True with the solution left in self.path. Each call is one expanded node
+        self.nodes += 1
+        if depth == 0:
+            return cross == SOLVED_CROSS and pairEdges == self.solvedPairEdges and corners == self.solvedCorners
+        crossMoves, crossDistances, pairEdgeMoves, cornerMoves = self.crossMoves, self.crossDistances, self.pairEdgeMoves, self.cornerMoves
+        pairs = list(zip(self.pairEdgeDistances, self.pairCornerDistances, [(edges >> 5) * 18 for edges in pairEdges],
+                         [edges & 31 for edges in pairEdges], [cornerMoves[corner] for corner in corners]))
+        crossRow = cross * 18
+        for move, face in twophase.PHASE1_NEXT[lastFace+1]:
+            newCross = crossMoves[crossRow + move]
+            if crossDistances[newCross] >= depth:
+                continue
+            newPairEdges, newCorners = [], []
+            for edgeDistances, cornerDistances, edgeRow, edgeFlips, moveCorner in pairs:
+                edges = pairEdgeMoves[edgeRow + move] ^ edgeFlips
+                if (edgeDistances[edges >> 1] >> ((edges & 1) << 2)) & 15 >= depth:
+                    break
+                corner = moveCorner[move]
+                pairCorner = newCross * 24 + corner
+                if (cornerDistances[pairCorner >> 1] >> ((pairCorner & 1) << 2)) & 15 >= depth:
+                    break
+                newPairEdges.append(edges)
+                newCorners.append(corner)
+            else:
+                self.path.append(move)
+                if self.search(newCross, tuple(newPairEdges), tuple(newCorners), depth-1, face):
+                    return True
+                self.path.pop()
+        return False
+
+
+def solveCross(edges):
+    # Optimal cross as a list of move indices
+    # edges (list) : state of each of the 12 edge pieces
+    return Search(None, edges).run()
+
+
+def solveXCross(corners, edges, slots=range(4)):
+    # Shortest X-cross over the given F2L slots, returns (slot, move indices)
+    # corners, edges (lists) : state of each piece
+    best = None
+    for slot in slots:
+        maxLength = 12 if best is None else len(best[1]) - 1
+        solution = Search(corners, edges, (slot,), maxLength).run()
+        if solution is not None:
+            best = (slot, solution)
+    return best
+
+
+def pieceStates(cube):
+    # (corners, edges) lists of a 3x3 cube.Cube as used by the searches
+    state = CubieCube.fromCube(cube)
+    corners = [0] * 8
+    edges = [0] * 12
+    for slot, value in enumerate(state.corners.tolist()):
+        corners[value // 3] = slot*3 + value % 3
+    for slot, value in enumerate(state.edges.tolist()):
+        edges[value // 2] = slot*2 + value % 2
+    return corners, edges
+
+
+if __name__ == '__main__':
+    from cube import CubeBatch
+    getTables()
+    batch = CubeBatch(3, 1)
+    batch.scramble(30, seed=1)
+    corners, edges = pieceStates(batch.getCube(0))
+    print('Cross: ' + ' '.join(MOVE_NAMES[move] for move in solveCross(edges)))
+    slot, moves = solveXCross(corners, edges)
+    print('X-cross in slot ' + str(slot) + ': ' + ' '.join(MOVE_NAMES[move] for move in moves))
@@ -1,8 +1,325 @@
 #!/usr/bin/env python
 
+from collections import OrderedDict
+from functools import lru_cache, wraps
+
 import numpy as np
 
 
+# Outward normal of each side with x pointing to R (2), y to U (0) and z to F (1)
+SIDE_NORMALS = np.array([[0, 1, 0], [0, 0, 1], [1, 0, 0], [0, -1, 0], [0, 0, -1], [-1, 0, 0]])
+
+# (row, col) of each side's block in the net, in units of size
+SIDE_OFFSETS = [(1, 3), (1, 2), (2, 2), (1, 1), (1, 0), (0, 2)]
+
+
+# Bytes of arrays kept by each arrayCache, a permutation of an NxN cube takes 48*N^2 of them
+ARRAY_CACHE_BYTES = 64 << 20
+
+
+def resultBytes(result):
+    # Bytes taken by a numpy array or a tuple of them
+    return result.nbytes if isinstance(result, np.ndarray) else sum(array.nbytes for array in result)
+
+
+def arrayCache(maxBytes):
+    # Like lru_cache for functions returning numpy arrays or tuples of them, but bounded by the bytes of the
+    # arrays kept instead of their number, since one permutation of a big cube can take megabytes. Results
+    # bigger than maxBytes are returned without being kept
+    def decorator(function):
+        cache = OrderedDict()
+        used = [0]
+
+        @wraps(function)
+        def cached(*args, **kwargs):
+            key = args + tuple(sorted(kwargs.items())) if kwargs else args
+            result = cache.get(key)
+            if result is not None:
+                cache.move_to_end(key)
+                return result
+            result = function(*args, **kwargs)
+            if resultBytes(result) <= maxBytes:
+                cache[key] = result
+                used[0] += resultBytes(result)
+                while used[0] > maxBytes:
+                    used[0] -= resultBytes(cache.popitem(last=False)[1])
+            return result
+
+        def cacheClear():
+            cache.clear()
+            used[0] = 0
+
+        cached.cache_clear = cacheClear
+        return cached
+    return decorator
+
+
+# Axis of the cubie coordinate giving the net row and column of each side's stickers, and whether it
+# is counted from the far end, the inverse of the cubies in stickerGeometry
+ROW_AXES, ROW_FLIPS = np.array([0, 0, 2, 0, 0, 2]), np.array([0, 0, 1, 0, 0, 0])
+COL_AXES, COL_FLIPS = np.array([2, 1, 1, 2, 1, 1]), np.array([1, 0, 0, 0, 1, 0])
+
+
+@arrayCache(ARRAY_CACHE_BYTES)
+def stickerGeometry(size):
+    # Locates every sticker of the net in 3D. Cubies are indexed 0..size-1 along each axis
+    # and sticker points are stored doubled and centered so they stay integers
+    # size (int) : cube size
+    # Returns (netIndex, points): flat net index of each sticker and its (x, y, z) point. netIndexOf
+    # maps points back to net indices
+    rows, cols = np.meshgrid(np.arange(size), np.arange(size), indexing='ij')
+    rows, cols = rows.ravel(), cols.ravel()
+    near, far = np.full_like(rows, size-1), np.zeros_like(rows)
+    # Cubie each local (row, col) of a side belongs to
+    cubies = [(rows, near, size-1-cols),
+              (rows, cols, near),
+              (near, cols, size-1-rows),
+              (rows, far, cols),
+              (rows, size-1-cols, far),
+              (far, cols, rows)]
+    netIndex, points = [], []
+    for side in range(6):
+        netIndex.append((rows + SIDE_OFFSETS[side][0]*size) * size*4 + cols + SIDE_OFFSETS[side][1]*size)
+        points.append(2*np.stack(cubies[side], axis=1) - (size-1) + SIDE_NORMALS[side])
+    netIndex = np.concatenate(netIndex)
+    points = np.concatenate(points)
+    for array in (netIndex, points):
+        array.flags.writeable = False
+    return netIndex, points
+
+
+def netIndexOf(size, points):
+    # Flat net index of the sticker at each doubled point (see stickerGeometry), -1 where there is none.
+    # Computed from the point rather than looked up, so big cubes need no table over all points
+    # points (int array) : shape (..., 3)
+    points = np.asarray(points)
+    flat = points.reshape(-1, 3)
+    # A sticker point sits at +-size along the normal of its side and on a cubie along the other axes
+    onSide = flat @ SIDE_NORMALS.T == size
+    side = onSide.argmax(axis=1)
+    doubled = flat - SIDE_NORMALS[side] + size-1
+    cubies = doubled // 2
+    valid = onSide.any(axis=1) & (doubled % 2 == 0).all(axis=1) & ((cubies >= 0) & (cubies < size)).all(axis=1)
+    rows = cubies[np.arange(len(flat)), ROW_AXES[side]]
+    rows = np.where(ROW_FLIPS[side], size-1 - rows, rows)
+    cols = cubies[np.arange(len(flat)), COL_AXES[side]]
+    cols = np.where(COL_FLIPS[side], size-1 - cols, cols)
+    offsets = np.array(SIDE_OFFSETS)[side]
+    netIndex = np.where(valid, (rows + offsets[:, 0]*size) * size*4 + cols + offsets[:, 1]*size, -1)
+    return netIndex.reshape(points.shape[:-1])
+
+
+def rotationMatrix(normal, quarterTurns):
+    # Integer matrix turning quarterTurns times clockwise when looking at the tip of normal
+    cos, sin = [(1, 0), (0, -1), (-1, 0), (0, 1)][quarterTurns % 4]
+    cross = np.array([[0, -normal[2], normal[1]], [normal[2], 0, -normal[0]], [-normal[1], normal[0], 0]])
+    return cos*np.eye(3, dtype=int) + sin*cross + (1-cos)*np.outer(normal, normal)
+
+
+def checkLayers(size, side, depth, width):
+    # Raises ValueError unless layers depth to depth+width-1 of side exist on a cube of size
+    if depth < 0 or width < 1 or depth + width > size:
+        raise ValueError('A ' + str(size) + 'x' + str(size) + ' cube has no layers ' + str(depth) + ' to ' + str(depth+width-1) + ' of ' + SIDE_NAMES[side])
+
+
+@arrayCache(ARRAY_CACHE_BYTES)
+def turnPermutation(size, side, direction, depth=0, width=1):
+    # Compiles a turn into an int32 index array over net.ravel(): turnedNet.ravel() = net.ravel()[perm]
+    # Arguments are the same as Cube.turn
+    checkLayers(size, side, depth, width)
+    netIndex, points = stickerGeometry(size)
+    normal = SIDE_NORMALS[side]
+    layer = np.minimum((size - points @ normal) // 2, size-1)
+    moving = (layer >= depth) & (layer < depth + width)
+    rotated = points[moving] @ rotationMatrix(normal, direction % 4).T
+    perm = np.arange(size*size*12, dtype=np.int32)
+    perm[netIndexOf(size, rotated)] = netIndex[moving]
+    perm.flags.writeable = False
+    return perm
+
+
+@lru_cache(maxsize=None)
+def layerStrips(size, side, depth):
+    # Describes the four strips of stickers moved by a turn as lines of the (6, size, size) face array
+    # They are ordered so a clockwise turn moves element i of each strip onto element i of the next one
+    # Returns a tuple of (face, isRow, index, step) where step is 1 or -1 along the line
+    netIndex, points = stickerGeometry(size)
+    normal = SIDE_NORMALS[side]
+    face = (side+1) % 6
+    facePoints = points[face*size*size:(face+1)*size*size]
+    linePoints = facePoints[(size - facePoints @ normal) // 2 == depth]
+    strips = []
+    for i in range(4):
+        line = netIndexOf(size, linePoints)
+        face = SIDE_OFFSETS.index((line[0] // (size*4) // size, line[0] % (size*4) // size))
+        rows = line // (size*4) - SIDE_OFFSETS[face][0]*size
+        cols = line % (size*4) - SIDE_OFFSETS[face][1]*size
+        isRow = bool((rows == rows[0]).all())
+        along = cols if isRow else rows
+        strips.append((face, isRow, int(rows[0] if isRow else cols[0]), 1 if len(along) < 2 or along[1] > along[0] else -1))
+        linePoints = linePoints @ rotationMatrix(normal, 1).T
+    return tuple(strips)
+
+
+@lru_cache(maxsize=None)
+def rotateFrame(frame, axis, direction):
+    # Returns the orientation frame after a whole cube rotation. frame[side] is the physical side
+    # currently seen as side, so turning side of a rotated cube turns physical side frame[side]
+    # axis (str) : 'x', 'y' or 'z', see Cube.rotate
+    # direction (int) : -1, 1 or 2
+    rotation = rotationMatrix(SIDE_NORMALS['yzx'.index(axis)], direction % 4)
+    normals = [tuple(normal) for normal in SIDE_NORMALS.tolist()]
+    return tuple(frame[normals.index(tuple(rotation.T @ SIDE_NORMALS[side]))] for side in range(6))
+
+
+@arrayCache(ARRAY_CACHE_BYTES)
+def framePermutation(size, frame):
+    # Permutation over net.ravel() that shows a physical net in an orientation frame, see rotateFrame
+    netIndex, points = stickerGeometry(size)
+    toPhysical = np.stack([SIDE_NORMALS[frame[2]], SIDE_NORMALS[frame[0]], SIDE_NORMALS[frame[1]]], axis=1)
+    perm = np.arange(size*size*12, dtype=np.int32)
+    perm[netIndex] = netIndexOf(size, points @ toPhysical.T)
+    perm.flags.writeable = False
+    return perm
+
+
+@arrayCache(ARRAY_CACHE_BYTES)
+def stickerSides(size):
+    # Side of every flat net index, -1 for the padding
+    netIndex = stickerGeometry(size)[0]
+    sides = np.full(size*size*12, -1, dtype=np.int8)
+    sides[netIndex] = np.repeat(np.arange(6), size*size)
+    sides.flags.writeable = False
+    return sides
+
+
+@lru_cache(maxsize=None)
+def pieceStickers(size, sides):
+    # Flat net indices of the stickers of a solved cube's corner, edge or center touching sides, in the same order
+    # Edges and centers are the middle ones, so they only exist on odd sizes
+    # sides (tuple of int) : 1 to 3 side numbers of different axes, such as (0, 2) for the UR edge
+    if not 1 <= len(sides) <= 3 or len({side % 3 for side in sides}) != len(sides):
+        raise ValueError('No piece touches sides ' + str(sides))
+    cubie = (size-1) * SIDE_NORMALS[list(sides)].sum(axis=0)
+    stickers = tuple(int(netIndexOf(size, cubie + SIDE_NORMALS[side])) for side in sides)
+    if -1 in stickers:
+        raise ValueError('A ' + str(size) + 'x' + str(size) + ' cube has no single piece touching sides ' + str(sides))
+    return stickers
+
+
+# Face letter of each side number
+SIDE_NAMES = 'UFRDBL'
+
+
+def parseMoves(moves):
+    # Turns a move string such as "R U R' U2 3F Rw 3Rw'" into a tuple of (side, direction, depth, width) turns
+    # A number in front of the face letter picks the layer counted from that face (2R is depth 1)
+    # A w after the face letter turns a block of layers from the face, two unless a number is given (3Rw)
+    # moves (str or list of str) : moves separated by spaces
+    if isinstance(moves, str):
+        moves = moves.split()
+    turns = []
+    for name in moves:
+        move, layer = name, ''
+        while move[:1].isdigit():
+            layer += move[0]
+            move = move[1:]
+        if not move or move[0] not in SIDE_NAMES or (layer and int(layer) == 0):
+            raise ValueError('Unknown move ' + name)
+        side = SIDE_NAMES.index(move[0])
+        suffix = move[1:]
+        if suffix.startswith('w'):
+            if layer and int(layer) < 2:
+                raise ValueError('Unknown move ' + name + ', a wide move turns at least 2 layers')
+            depth, width = 0, int(layer) if layer else 2
+            suffix = suffix[1:]
+        else:
+            depth, width = int(layer) - 1 if layer else 0, 1
+        if suffix == '':
+            turns.append((side, 1, depth, width))
+        elif suffix == "'":
+            turns.append((side, -1, depth, width))
+        elif suffix in ('2', "2'"):
+            turns.append((side, 2, depth, width))
+        else:
+            raise ValueError('Unknown move ' + name)
+    return tuple(turns)
+
+
+def formatMoves(turns):
+    # Inverse of parseMoves, returns a string such as "R U' 2F 3Rw2"
+    # Raises ValueError for turns the notation cannot write, blocks of layers that do not start at the face
+    names = []
+    for side, direction, depth, width in turns:
+        if width == 1:
+            name = (str(depth+1) if depth else '') + SIDE_NAMES[side]
+        elif depth == 0:
+            name = (str(width) if width != 2 else '') + SIDE_NAMES[side] + 'w'
+        else:
+            raise ValueError('Layers ' + str(depth) + ' to ' + str(depth+width-1) + ' of ' + SIDE_NAMES[side] + ' have no move name')
+        names.append(name + {1: '', 2: '2', -1: "'"}[direction])
+    return ' '.join(names)
+
+
+def invertMoves(moves):
+    # The turns undoing a move sequence, see parseMoves for the accepted forms
+    if isinstance(moves, str) or (len(moves) > 0 and isinstance(moves[0], str)):
+        moves = parseMoves(moves)
+    return tuple((side, -direction if direction != 2 else 2, depth, width) for side, direction, depth, width in reversed(moves))
+
+
+def simplifyMoves(moves, size=None):
+    # Shortens a move sequence in one pass without changing what it does
+    # Turns about the same axis commute, so runs of them are kept on a stack as one group of net quarter
+    # turns per layer block: R L R' becomes L, and when a group cancels out the turns before it can merge
+    # with the turns after it (R U U' R' becomes nothing). The result is never longer in the half turn metric
+    # moves (str, list of str or turns) : see parseMoves
+    # size (int) : cube size, when given a layer block named from either face (2R and 2L' on a 3x3) counts
+    #   as the same block
+    # Returns a tuple of (side, direction, depth, width) turns
+    if isinstance(moves, str) or (len(moves) > 0 and isinstance(moves[0], str)):
+        moves = parseMoves(moves)
+    groups = []
+    for side, direction, depth, width in moves:
+        if size is not None:
+            mirrored = size - depth - width
+            if mirrored < depth or (mirrored == depth and side >= 3):
+                side, direction, depth = (side+3) % 6, -direction if direction != 2 else 2, mirrored
+        if groups and groups[-1][0] == side % 3:
+            group = groups[-1][1]
+            key = (side, depth, width)
+            quarterTurns = (group.get(key, 0) + direction) % 4
+            if quarterTurns:
+                group[key] = quarterTurns
+            else:
+                del group[key]
+                if not group:
+                    groups.pop()
+        else:
+            groups.append((side % 3, {(side, depth, width): direction % 4}))
+    return tuple((side, (0, 1, 2, -1)[quarterTurns], depth, width) for axis, group in groups for (side, depth, width), quarterTurns in group.items())
+
+
+@arrayCache(ARRAY_CACHE_BYTES)
+def composePermutation(size, moves):
+    # Cached body of compileAlgorithm, moves must be a string or a tuple
+    if isinstance(moves, str) or (len(moves) > 0 and isinstance(moves[0], str)):
+        moves = parseMoves(moves)
+    perm = np.arange(size*size*12, dtype=np.int32)
+    for turn in moves:
+        perm = perm[turnPermutation(size, *turn)]
+    perm.flags.writeable = False
+    return perm
+
+
+def compileAlgorithm(size, moves):
+    # Returns the single permutation over net.ravel() that applies every move in order
+    # The result is cached, so replaying the same sequence only costs one gather
+    # size (int) : cube size
+    # moves (str, list of str or list of (side, direction, depth, width) turns) : see parseMoves
+    return composePermutation(size, moves if isinstance(moves, str) else tuple(moves))
+
+
 class Cube:
     def __init__(self, size):
         # size (int) : cube will be of dimensions size x size x size
@@ -12,6 +329,8 @@ class Cube:
         #        2
         # Side 1 is considered the "front" and side 0 is considered the "top"
         self.size = size
+        self.frame = tuple(range(6))
+        self.locations = None
         self.net = np.full((size*3, size*4), -1, dtype=np.int8)
         for row in range(size):
             for col in range(size*2, size*3):
@@ -29,161 +348,228 @@ class Cube:
             for col in range(size*2, size*3):
                 self.net[row][col] = 2
 
-    def turn(self, side, direction, depth=0):
+    def turn(self, side, direction, depth=0, width=1):
         # side (int) : side number to rotate
-        # direction (int) : -1 or 1, -1 is ccw 1 is cw
-        # depth (int) : how many layers into the cube to turn. 0 is outer layer and 1 is next layer in (outer layer is not rotated). depth should always be < size - 1
-
-        # Top face (0)
-        if side == 0:
-            # U
-            layer = np.append(self.net[:, self.size*3-1-depth], self.net[self.size:self.size*2, depth])
-            if direction == 1:
-                if depth == 0:
-                    self.net[self.size*1: self.size*2, self.size*3: self.size*4] = np.rot90(self.net[self.size*1: self.size*2, self.size*3: self.size*4], k=3)
-                layer = np.roll(layer, -self.size)
-            # U'
-            else:
-                if depth == 0:
-                    self.net[self.size*1: self.size*2, self.size*3: self.size*4] = np.rot90(self.net[self.size*1: self.size*2, self.size*3: self.size*4], k=1)
-                layer = np.roll(layer, self.size)
-            self.net[:, self.size*3-1-depth] = layer[:self.size*3]
-            self.net[self.size:self.size*2, depth] = layer[self.size*3:]
-
-        # Front Face (1)
-        if side == 1:
-            # F
-            layer = np.append(self.net[self.size-1-depth, self.size*2:self.size*3], [self.net[self.size:self.size*2, self.size*2-1-depth], self.net[self.size*2+depth, self.size*2:self.size*3], self.net[self.size:self.size*2, self.size*3+depth]])
-            if direction == 1:
-                if depth == 0:
-                    self.net[self.size*1: self.size*2, self.size*2: self.size*3] = np.rot90(self.net[self.size*1: self.size*2, self.size*2: self.size*3], k=3)
-                layer = np.roll(layer, -self.size)
-            # F'
-            else:
-                if depth == 0:
-                    self.net[self.size*1: self.size*2, self.size*2: self.size*3] = np.rot90(self.net[self.size*1: self.size*2, self.size*2: self.size*3], k=1)
-                layer = np.roll(layer, self.size)
-            self.net[self.size-1-depth, self.size*2:self.size*3] = layer[:self.size]
-            self.net[self.size:self.size*2, self.size*2-1-depth] = layer[self.size:self.size*2]
-            self.net[self.size*2+depth, self.size*2:self.size*3] = layer[self.size*2:self.size*3]
-            self.net[self.size:self.size*2, self.size*3+depth] = layer[self.size*3:]
-
-        # Right Face (2)
-        if side == 2:
-            # R
-            layer = self.net[self.size*2-1-depth, :]
-            if direction == 1:
-                if depth == 0:
-                    self.net[self.size*2:, self.size*2: self.size*3] = np.rot90(self.net[self.size*2:, self.size*2: self.size*3], k=3)
-                layer = np.roll(layer, self.size)
-            # R'
-            else:
-                if depth == 0:
-                    self.net[self.size*2:, self.size*2: self.size*3] = np.rot90(self.net[self.size*2:, self.size*2: self.size*3], k=1)
-                layer = np.roll(layer, -self.size)
-            self.net[self.size*2-1-depth, :] = layer
-
-        # Bottom (Down) Face (3)
-        if side == 3:
-            # D
-            layer = np.append(self.net[:, self.size*2+depth], self.net[self.size:self.size*2, self.size-1-depth])
-            if direction == 1:
-                if depth == 0:
-                    self.net[self.size:self.size*2, self.size:self.size*2] = np.rot90(self.net[self.size:self.size*2, self.size:self.size*2], k=3)
-                layer = np.roll(layer, self.size)
-            # D'
-            else:
-                if depth == 0:
-                    self.net[self.size:self.size*2:, self.size:self.size*2] = np.rot90(self.net[self.size:self.size*2, self.size:self.size*2], k=1)
-                layer = np.roll(layer, -self.size)
-            self.net[:, self.size*2+depth] = layer[:self.size*3]
-            self.net[self.size:self.size*2, self.size-1-depth] = layer[self.size*3:]
-
-        # Back Face (4)
-        if side == 4:
-            # B
-            layer = np.append(self.net[self.size:self.size*2, self.size+depth], [self.net[depth, self.size*2:self.size*3], self.net[self.size:self.size*2, self.size*4-1-depth], self.net[self.size*3-1-depth, self.size*2:self.size*3]])
-            if direction == 1:
-                if depth == 0:
-                    self.net[self.size:self.size*2, :self.size] = np.rot90(self.net[self.size:self.size*2, :self.size], k=3)
-                layer = np.roll(layer, -self.size)
-            # B'
-            else:
-                if depth == 0:
-                    self.net[self.size:self.size*2:, :self.size] = np.rot90(self.net[self.size:self.size*2, :self.size], k=1)
-                layer = np.roll(layer, self.size)
-            self.net[self.size:self.size*2, self.size+depth] = layer[:self.size]
-            self.net[depth, self.size*2:self.size*3] = layer[self.size:self.size*2]
-            self.net[self.size:self.size*2, self.size*4-1-depth] = layer[self.size*2:self.size*3]
-            self.net[self.size*3-1-depth, self.size*2:self.size*3] = layer[self.size*3:]
-
-        # Left Face (5)
-        if side == 5:
-            # L
-            layer = self.net[self.size+depth]
-            if direction == 1:
-                if depth == 0:
-                    self.net[:self.size, self.size*2:self.size*3] = np.rot90(self.net[:self.size, self.size*2:self.size*3], k=3)
-                layer = np.roll(layer, -self.size)
-            # L'
-            else:
-                if depth == 0:
-                    self.net[:self.size:, self.size*2:self.size*3] = np.rot90(self.net[:self.size, self.size*2:self.size*3], k=1)
-                layer = np.roll(layer, self.size)
-            self.net[self.size+depth] = layer
+        # direction (int) : -1, 1 or 2, -1 is ccw 1 is cw and 2 is a half turn
+        # depth (int) : how many layers into the cube to turn. 0 is outer layer and 1 is next layer in (outer layer is not rotated)
+        # width (int) : number of layers turned together starting at depth, 2 with depth 0 is a wide move like Rw
+        # Sides are read in the current orientation frame, see rotate
+        # Raises ValueError unless 0 <= depth and depth + width <= size, see checkLayers
+        perm = turnPermutation(self.size, self.frame[side], direction, depth, width)
+        self.net = np.take(self.net.ravel(), perm).reshape(self.net.shape)
+        if self.locations is not None:
+            # The inverse turn's permutation maps each index to where its sticker went
+            self.locations = turnPermutation(self.size, self.frame[side], -direction, depth, width)[self.locations]
+
+    def apply(self, moves):
+        # Applies a whole move sequence with one gather, see compileAlgorithm
+        if self.frame != tuple(range(6)):
+            if isinstance(moves, str) or (len(moves) > 0 and isinstance(moves[0], str)):
+                moves = parseMoves(moves)
+            moves = [(self.frame[side],) + tuple(turn) for side, *turn in moves]
+        self.net = np.take(self.net.ravel(), compileAlgorithm(self.size, moves)).reshape(self.net.shape)
+        if self.locations is not None:
+            self.locations = compileAlgorithm(self.size, invertMoves(moves))[self.locations]
+
+    def trackPieces(self):
+        # Starts keeping an index of where every sticker is, updated by each turn with one more gather,
+        # so locatePiece is a lookup instead of a search of the net. Stickers are followed from their
+        # places on a solved cube, so tracking should start on a solved cube and the net should only
+        # change through turn and apply afterwards
+        self.locations = np.arange(self.size*self.size*12, dtype=np.int32)
+
+    def locatePiece(self, sides):
+        # Where the piece that sits at sides on a solved cube has gone, as the sides its stickers face now,
+        # in the same order and read in the current orientation frame. After R, locatePiece((0, 2)) is
+        # (4, 2): the UR edge is at BR with its U colored sticker on B. See trackPieces
+        # sides (tuple of int) : home sides of a corner, edge or center, see pieceStickers
+        if self.locations is None:
+            raise ValueError('Piece tracking is off, call trackPieces first')
+        physical = stickerSides(self.size)[self.locations[list(pieceStickers(self.size, tuple(sides)))]]
+        return tuple(self.frame.index(side) for side in physical.tolist())
+
+    def isSolved(self):
+        # True when every side shows a single color
+        stickers = self.net.ravel()[stickerGeometry(self.size)[0]].reshape(6, -1)
+        return bool((stickers == stickers[:, :1]).all())
 
     def rotate(self, axis, direction):
-        # Rotate the entire cube
+        # Rotate the entire cube. Only the orientation frame changes, no stickers are moved
         # axis (str) : 'x', 'y', or 'z'. x is R->L, y is U->D, z is F->B. Perspective from the first letter here (x means rotate cw about R face)
-        # direction (int) : -1 or 1. -1 is ccw 1 is cw
-
-        # Right face
-        if axis == 'x':
-            # x'
-            if direction == -1:
-                self.net[:self.size, self.size*2:self.size*3] = np.rot90(self.net[:self.size, self.size*2:self.size*3], k=3)
-                self.net[self.size:self.size*2, :] = np.roll(self.net[self.size:self.size*2, :], -3, axis=1)
-                self.net[self.size*2:self.size*3, self.size*2:self.size*3] = np.rot90(self.net[self.size*2:self.size*3, self.size*2:self.size*3], k=1)
-            # x
-            elif direction == 1:
-                self.net[:self.size, self.size*2:self.size*3] = np.rot90(self.net[:self.size, self.size*2:self.size*3], k=1)
-                self.net[self.size:self.size*2, :] = np.roll(self.net[self.size:self.size*2, :], 3, axis=1)
-                self.net[self.size*2:self.size*3, self.size*2:self.size*3] = np.rot90(self.net[self.size*2:self.size*3, self.size*2:self.size*3], k=3)
-
-        # Top face
-        elif axis == 'y':
-            layers = np.append(self.net[:, self.size*2:self.size*3], self.net[self.size:self.size*2, :self.size])
-            # y'
-            if direction == -1:
-                self.net[self.size:self.size*2, self.size:self.size*2] = np.rot90(self.net[self.size:self.size*2, self.size:self.size*2], k=1)
-                self.net[self.size:self.size*2, self.size*3:] = np.rot90(self.net[self.size:self.size*2, self.size*3:], k=3)
-                layers = np.roll(layers, -9, axis=0)
-            # y
-            elif direction == 1:
-                self.net[self.size:self.size*2, self.size:self.size*2] = np.rot90(self.net[self.size:self.size*2, self.size:self.size*2], k=3)
-                self.net[self.size:self.size*2, self.size*3:] = np.rot90(self.net[self.size:self.size*2, self.size*3:], k=1)
-                layers = np.roll(layers, 9, axis=0)
-            layers = np.reshape(layers, (self.size*4, self.size), order='C')
-            self.net[:, self.size*2:self.size*3] = layers[:self.size*3, :]
-            self.net[self.size:self.size*2, :self.size] = layers[self.size*3:, :]
-
-        # Front face
-        elif axis == 'z':
-            layers = np.concatenate([self.net[self.size:self.size*2, self.size:self.size*2], self.net[:self.size, self.size*2:self.size*3], self.net[self.size:self.size*2, self.size*3:], self.net[self.size*2:self.size*3, self.size*2:self.size*3]], axis=0)
-            # z'
-            if direction == -1:
-                self.net[self.size:self.size*2, :self.size] = np.rot90(self.net[self.size:self.size*2, :self.size], k=1)
-                self.net[self.size:self.size*2, self.size*2:self.size*3] = np.rot90(self.net[self.size:self.size*2, self.size*2:self.size*3], k=3)
-                layers = np.roll(layers, -9, axis=0)
-            # z
-            elif direction == 1:
-                self.net[self.size:self.size*2, :self.size] = np.rot90(self.net[self.size:self.size*2, :self.size], k=3)
-                self.net[self.size:self.size*2, self.size*2:self.size*3] = np.rot90(self.net[self.size:self.size*2, self.size*2:self.size*3], k=1)
-                layers = np.roll(layers, 9, axis=0)
-            self.net[self.size:self.size*2, self.size:self.size*2] = layers[:self.size]
-            self.net[:self.size, self.size*2:self.size*3] = layers[self.size:self.size*2]
-            self.net[self.size:self.size*2, self.size*3:] = layers[self.size*2:self.size*3]
-            self.net[self.size*2:self.size*3, self.size*2:self.size*3] = layers[self.size*3:]
+        # direction (int) : -1, 1 or 2. -1 is ccw 1 is cw and 2 is a half turn
+        self.frame = rotateFrame(self.frame, axis, direction)
+
+    def orientedNet(self):
+        # The net as seen in the current orientation frame, built on demand for display
+        return np.take(self.net.ravel(), framePermutation(self.size, self.frame)).reshape(self.size*3, self.size*4)
+
+
+class FaceCube(Cube):
+    def __init__(self, size):
+        # Stores the cube as a (6, size, size) array of faces instead of a padded net. Each face keeps
+        # the orientation of its block in the net and turns move strips in place through strided
+        # views, so nothing is allocated per turn. Meant for big cubes
+        # size (int) : cube will be of dimensions size x size x size
+        self.size = size
+        self.frame = tuple(range(6))
+        self.locations = None
+        self.faces = np.repeat(np.arange(6, dtype=np.int8), size*size).reshape(6, size, size)
+        self.scratch = np.empty((size, size), dtype=np.int8)
+        self.strips = {}
+
+    @property
+    def net(self):
+        # The (3*size, 4*size) net used by Cube, rebuilt from the faces on every access. It is read only, since
+        # writes to a copy would be lost: change stickers through the faces, or assign a whole net
+        net = np.full((self.size*3, self.size*4), -1, dtype=self.faces.dtype)
+        for side, (row, col) in enumerate(SIDE_OFFSETS):
+            net[row*self.size:(row+1)*self.size, col*self.size:(col+1)*self.size] = self.faces[side]
+        net.flags.writeable = False
+        return net
+
+    @net.setter
+    def net(self, net):
+        for side, (row, col) in enumerate(SIDE_OFFSETS):
+            self.faces[side] = net[row*self.size:(row+1)*self.size, col*self.size:(col+1)*self.size]
+
+    def stripViews(self, side, depth, width):
+        # Views into self.faces of the four blocks moved by a turn, each shaped (width, size) with
+        # the first axis going away from the turned face. See layerStrips
+        views = self.strips.get((side, depth, width))
+        if views is None:
+            views = []
+            for face, isRow, index, step in layerStrips(self.size, side, depth):
+                inward = 1 if width == 1 or layerStrips(self.size, side, depth+1)[len(views)][2] > index else -1
+                layers = slice(index, index + inward*width if index + inward*width >= 0 else None, inward)
+                views.append(self.faces[face, layers, ::step] if isRow else self.faces[face, ::step, layers].T)
+            self.strips[(side, depth, width)] = views
+        return views
+
+    def rotateFace(self, face, direction):
+        # Rotates the stickers of one face in place, direction 1 is cw seen from outside the cube and 2 is a half turn
+        np.copyto(self.scratch, np.rot90(self.faces[face], -direction))
+        self.faces[face] = self.scratch
+
+    def turn(self, side, direction, depth=0, width=1):
+        # Same arguments as Cube.turn. The four blocks of layers are cycled through one preallocated buffer
+        side = self.frame[side]
+        checkLayers(self.size, side, depth, width)
+        if direction % 4 == 0:
+            return
+        first, second, third, fourth = self.stripViews(side, depth, width)
+        scratch = self.scratch[:width]
+        if direction == 1:
+            scratch[:] = fourth
+            fourth[:] = third
+            third[:] = second
+            second[:] = first
+            first[:] = scratch
+        elif direction % 4 == 2:
+            scratch[:] = first
+            first[:] = third
+            third[:] = scratch
+            scratch[:] = second
+            second[:] = fourth
+            fourth[:] = scratch
+        else:
+            scratch[:] = first
+            first[:] = second
+            second[:] = third
+            third[:] = fourth
+            fourth[:] = scratch
+        if depth == 0:
+            self.rotateFace(side, direction)
+        if depth + width == self.size:
+            self.rotateFace((side+3) % 6, -direction)
+        if self.locations is not None:
+            self.locations = turnPermutation(self.size, side, -direction, depth, width)[self.locations]
+
+    def apply(self, moves):
+        # Applies a move sequence turn by turn, see parseMoves
+        if isinstance(moves, str) or (len(moves) > 0 and isinstance(moves[0], str)):
+            moves = parseMoves(moves)
+        for turn in moves:
+            self.turn(*turn)
+
+    def isSolved(self):
+        # True when every side shows a single color
+        return bool((self.faces == self.faces[:, :1, :1]).all())
+
+
+class CubeBatch:
+    def __init__(self, size, count):
+        # Holds count cubes of the same size as one (count, 3*size, 4*size) array of nets so
+        # a move can be applied to every cube with a single gather
+        # size (int) : cube size
+        # count (int) : number of cubes, all starting solved
+        self.size = size
+        self.nets = np.repeat(Cube(size).net[np.newaxis], count, axis=0)
+
+    def __len__(self):
+        return len(self.nets)
+
+    @classmethod
+    def fromCubes(cls, cubes):
+        # Builds a batch from a list of same sized Cube objects, each as seen in its orientation frame
+        # (see Cube.rotate), since batch turns name sides as seen
+        batch = cls(cubes[0].size, 0)
+        batch.nets = np.stack([cube.orientedNet() for cube in cubes])
+        return batch
+
+    def getCube(self, index):
+        # Returns a copy of one cube in the batch as a Cube
+        cube = Cube(self.size)
+        cube.net = self.nets[index].copy()
+        return cube
+
+    def turn(self, side, direction, depth=0, width=1):
+        # Applies the same turn to every cube, arguments are the same as Cube.turn
+        perm = turnPermutation(self.size, side, direction, depth, width)
+        self.nets = self.nets.reshape(len(self.nets), -1)[:, perm].reshape(self.nets.shape)
+
+    def apply(self, moves):
+        # Applies the same move sequence to every cube with one gather, see compileAlgorithm
+        perm = compileAlgorithm(self.size, moves)
+        self.nets = self.nets.reshape(len(self.nets), -1)[:, perm].reshape(self.nets.shape)
+
+    def turnEach(self, sides, directions, depths=0, widths=1):
+        # Applies a different turn to each cube
+        # sides (int array) : side to turn for each cube
+        # directions (int array) : -1, 1 or 2 for each cube
+        # depths (int array or int) : layer depth for each cube
+        # widths (int array or int) : number of layers turned for each cube
+        sides, directions, depths, widths = np.broadcast_arrays(sides, directions, depths, widths)
+        shape = (6, 4, self.size, self.size+1)
+        keys = np.ravel_multi_index((sides, directions % 4, depths, widths), shape).ravel()
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        starts = np.flatnonzero(np.diff(keys, prepend=-1))
+        flat = self.nets.reshape(len(self.nets), -1)
+        turned = np.empty_like(flat)
+        # Gather each group of cubes sharing a move with that move's permutation
+        for start, end in zip(starts, np.append(starts[1:], len(keys))):
+            side, quarterTurns, depth, width = np.unravel_index(keys[start], shape)
+            rows = order[start:end]
+            perm = turnPermutation(self.size, int(side), [0, 1, 2, -1][quarterTurns], int(depth), int(width))
+            turned[rows] = flat[rows][:, perm]
+        self.nets = turned.reshape(self.nets.shape)
+
+    def scramble(self, length, seed=None):
+        # Turns every cube length times at random, each cube getting its own scramble
+        # Returns the (sides, directions, depths) arrays used, each of shape (count, length)
+        rng = np.random.default_rng(seed)
+        shape = (len(self.nets), length)
+        sides = rng.integers(0, 6, shape)
+        directions = rng.choice([-1, 1, 2], shape)
+        depths = rng.integers(0, max(self.size // 2, 1), shape)
+        for i in range(length):
+            self.turnEach(sides[:, i], directions[:, i], depths[:, i])
+        return sides, directions, depths
+
+    def isSolved(self):
+        # Returns a boolean array, True for each cube where every side shows a single color
+        stickers = self.nets.reshape(len(self.nets), -1)[:, stickerGeometry(self.size)[0]].reshape(len(self.nets), 6, -1)
+        return (stickers == stickers[:, :, :1]).all(axis=(1, 2))
 
 
 if __name__ == '__main__':
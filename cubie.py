@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+
+# Cubie level representation of a 3x3 cube
+# Corners and edges use the usual slot order of coordinate solvers:
+#   corners URF UFL ULB UBR DFR DLF DBL DRB
+#   edges   UR UF UL UB DR DF DL DB FR FL BL BR
+# Each corner is stored as one byte holding permutation*3 + orientation and each edge as
+# permutation*2 + orientation, so a state takes 20 bytes
+
+from functools import lru_cache
+
+import numpy as np
+
+from cube import SIDE_NAMES, SIDE_NORMALS, Cube, netIndexOf
+
+CORNER_NAMES = ['URF', 'UFL', 'ULB', 'UBR', 'DFR', 'DLF', 'DBL', 'DRB']
+EDGE_NAMES = ['UR', 'UF', 'UL', 'UB', 'DR', 'DF', 'DL', 'DB', 'FR', 'FL', 'BL', 'BR']
+
+# Sides of each slot's facelets, corners list the U/D facelet first and go clockwise
+CORNER_SIDES = np.array([[0, 2, 1], [0, 1, 5], [0, 5, 4], [0, 4, 2], [3, 1, 2], [3, 5, 1], [3, 4, 5], [3, 2, 4]])
+EDGE_SIDES = np.array([[0, 2], [0, 1], [0, 5], [0, 4], [3, 2], [3, 1], [3, 5], [3, 4], [1, 2], [1, 5], [4, 5], [4, 2]])
+
+# Piece and orientation of a corner read clockwise from its U/D color, indexed by 36*first + 6*second + third
+CORNER_LOOKUP = np.full(216, -1, dtype=np.int8)
+CORNER_LOOKUP[CORNER_SIDES @ [36, 6, 1]] = np.arange(8)
+# piece*2 + orientation of an edge, indexed by 6*first + second facelet color
+EDGE_LOOKUP = np.full(36, -1, dtype=np.int8)
+EDGE_LOOKUP[EDGE_SIDES @ [6, 1]] = np.arange(12) * 2
+EDGE_LOOKUP[EDGE_SIDES @ [1, 6]] = np.arange(12) * 2 + 1
+
+
+@lru_cache(maxsize=None)
+def cornerFacelets(size):
+    # Flat net indices of the corner stickers as an (8, 3) array ordered like CORNER_SIDES
+    facelets = np.empty((8, 3), dtype=np.intp)
+    for corner, sides in enumerate(CORNER_SIDES):
+        cubie = (size-1) * SIDE_NORMALS[sides].sum(axis=0)
+        for i, side in enumerate(sides):
+            facelets[corner, i] = netIndexOf(size, cubie + SIDE_NORMALS[side])
+    facelets.flags.writeable = False
+    return facelets
+
+
+@lru_cache(maxsize=None)
+def edgeFacelets(size):
+    # Flat net indices of the middle edge stickers as a (12, 2) array ordered like EDGE_SIDES
+    # size must be odd
+    facelets = np.empty((12, 2), dtype=np.intp)
+    for edge, sides in enumerate(EDGE_SIDES):
+        cubie = (size-1) * SIDE_NORMALS[sides].sum(axis=0)
+        for i, side in enumerate(sides):
+            facelets[edge, i] = netIndexOf(size, cubie + SIDE_NORMALS[side])
+    facelets.flags.writeable = False
+    return facelets
+
+
+@lru_cache(maxsize=None)
+def centerFacelets(size):
+    # Flat net index of the middle sticker of each side, size must be odd
+    return netIndexOf(size, SIDE_NORMALS * size)
+
+
+def netsToCubies(nets):
+    # Reads the corners and edges of 3x3 nets
+    # nets (array) : one (9, 12) net or a (count, 9, 12) batch of them, colors are matched to sides by the centers
+    # Returns (corners, edges) uint8 arrays of shape (..., 8) and (..., 12)
+    nets = np.asarray(nets)
+    flat = nets.reshape(-1, 108)
+    sideOfColor = np.empty((len(flat), 6), dtype=np.intp)
+    np.put_along_axis(sideOfColor, flat[:, centerFacelets(3)].astype(np.intp), np.arange(6)[np.newaxis], axis=1)
+
+    cornerSides = np.take_along_axis(sideOfColor, flat[:, cornerFacelets(3).ravel()].astype(np.intp), axis=1).reshape(-1, 8, 3)
+    twist = np.argmax((cornerSides == 0) | (cornerSides == 3), axis=2)
+    turned = np.take_along_axis(cornerSides, (twist[:, :, np.newaxis] + np.arange(3)) % 3, axis=2)
+    pieces = CORNER_LOOKUP[turned @ [36, 6, 1]]
+
+    edgeSides = np.take_along_axis(sideOfColor, flat[:, edgeFacelets(3).ravel()].astype(np.intp), axis=1).reshape(-1, 12, 2)
+    edges = EDGE_LOOKUP[edgeSides @ [6, 1]]
+    if (pieces < 0).any() or (edges < 0).any():
+        raise ValueError('Net does not hold valid 3x3 pieces')
+
+    corners = (pieces * 3 + twist).astype(np.uint8)
+    edges = edges.astype(np.uint8)
+    return corners.reshape(nets.shape[:-2] + (8,)), edges.reshape(nets.shape[:-2] + (12,))
+
+
+def cubiesToNets(corners, edges):
+    # Inverse of netsToCubies, builds nets colored with the standard side numbers
+    corners, edges = np.asarray(corners), np.asarray(edges)
+    flatCorners, flatEdges = corners.reshape(-1, 8), edges.reshape(-1, 12)
+    nets = np.repeat(Cube(3).net.reshape(1, -1), len(flatCorners), axis=0)
+
+    cp, co = flatCorners // 3, flatCorners % 3
+    nets[:, cornerFacelets(3).ravel()] = CORNER_SIDES[cp[:, :, np.newaxis], (np.arange(3) - co[:, :, np.newaxis]) % 3].reshape(-1, 24)
+    ep, eo = flatEdges // 2, flatEdges % 2
+    nets[:, edgeFacelets(3).ravel()] = EDGE_SIDES[ep[:, :, np.newaxis], (np.arange(2) + eo[:, :, np.newaxis]) % 2].reshape(-1, 24)
+    return nets.reshape(corners.shape[:-1] + (9, 12))
+
+
+def multiplyCubies(corners, edges, moveCorners, moveEdges):
+    # Applies the cubie state (moveCorners, moveEdges) after (corners, edges). Works on single states and batches
+    cp, co = corners // 3, corners % 3
+    mcp, mco = moveCorners // 3, moveCorners % 3
+    ep, eo = edges // 2, edges % 2
+    mep, meo = moveEdges // 2, moveEdges % 2
+    newCorners = np.take_along_axis(cp, np.broadcast_to(mcp, cp.shape), axis=-1) * 3 + (np.take_along_axis(co, np.broadcast_to(mcp, co.shape), axis=-1) + mco) % 3
+    newEdges = np.take_along_axis(ep, np.broadcast_to(mep, ep.shape), axis=-1) * 2 + (np.take_along_axis(eo, np.broadcast_to(mep, eo.shape), axis=-1) + meo) % 2
+    return newCorners.astype(np.uint8), newEdges.astype(np.uint8)
+
+
+def permutationRank(perms):
+    # Lehmer code rank of permutations of 0..n-1 given along the last axis, 0 for the identity
+    perms = np.asarray(perms)
+    n = perms.shape[-1]
+    ranks = np.zeros(perms.shape[:-1], dtype=np.int64)
+    for i in range(n):
+        smallerAfter = (perms[..., i+1:] < perms[..., i:i+1]).sum(axis=-1)
+        ranks = ranks * (n-i) + smallerAfter
+    return ranks
+
+
+def permutationFromRank(ranks, n):
+    # Inverse of permutationRank, returns an array of shape ranks.shape + (n,)
+    return partialPermutationFromRank(ranks, n, n)
+
+
+def partialPermutationRank(values, n):
+    # Rank of k distinct values out of 0..n-1 given along the last axis, in the lexicographic order of
+    # all n!/(n-k)! such arrangements. permutationRank is the case k = n
+    values = np.asarray(values)
+    k = values.shape[-1]
+    ranks = np.zeros(values.shape[:-1], dtype=np.int64)
+    for i in range(k):
+        smallerBefore = (values[..., :i] < values[..., i:i+1]).sum(axis=-1)
+        ranks = ranks * (n-i) + values[..., i] - smallerBefore
+    return ranks
+
+
+def partialPermutationFromRank(ranks, n, k):
+    # Inverse of partialPermutationRank, returns an array of shape ranks.shape + (k,)
+    shape = np.shape(ranks)
+    ranks = np.array(ranks, dtype=np.int64).ravel()
+    digits = np.empty((len(ranks), k), dtype=np.int64)
+    for i in range(k-1, -1, -1):
+        digits[:, i] = ranks % (n-i)
+        ranks //= n-i
+    remaining = np.tile(np.arange(n), (len(ranks), 1))
+    values = np.empty((len(ranks), k), dtype=np.int64)
+    for i in range(k):
+        values[:, i] = remaining[np.arange(len(ranks)), digits[:, i]]
+        keep = np.arange(n-i) != digits[:, i, np.newaxis]
+        remaining = remaining[keep].reshape(len(ranks), n-i-1)
+    return values.reshape(shape + (k,))
+
+
+# The 18 face turns as cubie states in the order U U2 U' F F2 F' R ... following SIDE_NAMES
+MOVE_NAMES = [name + suffix for name in SIDE_NAMES for suffix in ('', '2', "'")]
+MOVE_CUBIES = []
+for _name in MOVE_NAMES:
+    _cube = Cube(3)
+    _cube.apply(_name)
+    MOVE_CUBIES.append(netsToCubies(_cube.net))
+MOVE_CORNERS = np.array([corners for corners, edges in MOVE_CUBIES])
+MOVE_EDGES = np.array([edges for corners, edges in MOVE_CUBIES])
+del _name, _cube
+
+
+def edgeGroupMoveTable(k):
+    # Coordinate positions*2^k + flips of k edge pieces after each move, for every position rank with no
+    # flips, shaped (12!/(12-k)!, 18). Bit i of the flips belongs to the i-th piece of the group. A move flips
+    # the same edges whatever their flips were, so for a state s the new state is table[s >> k, move] ^ (s & (2^k - 1))
+    count = int(np.prod(np.arange(12-k+1, 13)))
+    slots = partialPermutationFromRank(np.arange(count), 12, k)
+    table = np.empty((count, 18), dtype=np.uint32)
+    for move in range(18):
+        # The piece in slot p goes to destination[p] and gains flip[p]
+        destination = np.argsort(MOVE_EDGES[move] // 2)
+        flip = MOVE_EDGES[move][destination] % 2
+        table[:, move] = partialPermutationRank(destination[slots], 12) * (1 << k) + flip[slots] @ (1 << np.arange(k))
+    return table
+
+
+def pieceMoveTables():
+    # (corners, edges): state of a single corner (slot*3 + twist) and of a single edge (slot*2 + flip)
+    # after each move, both shaped (24, 18)
+    states = np.arange(24)
+    tables = []
+    for moveCubies, twists in ((MOVE_CORNERS, 3), (MOVE_EDGES, 2)):
+        table = np.empty((24, 18), dtype=np.int64)
+        for move in range(18):
+            # The piece in slot p goes to destination[p] and gains moveCubies[move][destination[p]] % twists
+            destination = np.argsort(moveCubies[move] // twists)[states // twists]
+            table[:, move] = destination * twists + (states % twists + moveCubies[move][destination] % twists) % twists
+        tables.append(table)
+    return tuple(tables)
+
+
+class CubieCube:
+    def __init__(self, corners=None, edges=None):
+        # corners (uint8 array) : 8 values of permutation*3 + orientation, solved if None
+        # edges (uint8 array) : 12 values of permutation*2 + orientation, solved if None
+        self.corners = np.arange(8, dtype=np.uint8) * 3 if corners is None else np.array(corners, dtype=np.uint8)
+        self.edges = np.arange(12, dtype=np.uint8) * 2 if edges is None else np.array(edges, dtype=np.uint8)
+
+    @classmethod
+    def fromCube(cls, cube):
+        # Reads a 3x3 cube.Cube (or FaceCube) as seen in its current orientation frame
+        return cls(*netsToCubies(cube.orientedNet()))
+
+    def toCube(self):
+        cube = Cube(3)
+        cube.net = cubiesToNets(self.corners, self.edges).astype(np.int8)
+        return cube
+
+    @property
+    def cp(self):
+        return self.corners // 3
+
+    @property
+    def co(self):
+        return self.corners % 3
+
+    @property
+    def ep(self):
+        return self.edges // 2
+
+    @property
+    def eo(self):
+        return self.edges % 2
+
+    def move(self, move):
+        # Applies one of the 18 face turns given by its index in MOVE_NAMES
+        self.corners, self.edges = multiplyCubies(self.corners, self.edges, MOVE_CORNERS[move], MOVE_EDGES[move])
+
+    def apply(self, moves):
+        # Applies a string of face turns such as "R U R' U'"
+        for name in moves.split():
+            self.move(MOVE_NAMES.index(name))
+
+    def isSolved(self):
+        return bool((self.corners == np.arange(8) * 3).all() and (self.edges == np.arange(12) * 2).all())
+
+    def __eq__(self, other):
+        return (self.corners == other.corners).all() and (self.edges == other.edges).all()
+
+    def __repr__(self):
+        return 'CubieCube(' + str(self.corners.tolist()) + ', ' + str(self.edges.tolist()) + ')'
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+
+# Disk-backed breadth-first search for distance tables that do not fit in memory
+# The states are split into ranges (shards). Each shard keeps its packed distances in its own file,
+# so only one shard has to be in memory at a time, and every depth runs in two phases:
+#   expand  each frontier shard is expanded and the neighbours are written as sorted runs, one file
+#           per target shard
+#   merge   each target shard streams a k-way merge of its runs, drops states it has already seen and
+#           writes the rest as the next frontier
+# Work is handed out through claim files in a shared work directory, so any number of processes, on
+# one machine or several sharing the directory, can take part in the same build by calling
+# generateOnDisk with the same arguments. The result is an ordinary distance file (see tables.py)
+#
+# Work directory layout:
+#   shard-<t>.bin                 packed distances of states t*shardSize .. (t+1)*shardSize-1
+#   depth-<d>/frontier-<t>.bin    sorted states of shard t at distance d, raw int64 so merges can append to it
+#   depth-<d>/runs-<t>-<s>-<i>.npy   sorted neighbours in shard t of chunk i of frontier shard s
+#   *.claim, *.done               markers, merge-<t>.done holds the number of new states and finish.done
+#                                 is written once the distance file is complete
+
+import glob
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+import tables
+
+# Seconds between looks at the work directory while other participants finish a phase
+POLL_INTERVAL = 0.05
+
+
+def claim(path):
+    # True for exactly one of the participants calling it with the same path
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+
+def markDone(path, text=''):
+    temporary = path + '.' + str(os.getpid()) + '.tmp'
+    with open(temporary, 'w') as file:
+        file.write(text)
+    os.replace(temporary, path)
+
+
+def saveArray(path, array):
+    # np.save through a temporary file so readers never see a partial array
+    temporary = path + '.' + str(os.getpid()) + '.tmp.npy'
+    np.save(temporary, array)
+    os.replace(temporary, path)
+
+
+def loadStates(path):
+    # Memory-mapped raw int64 states of a frontier file, np.memmap refuses empty files
+    if not os.path.getsize(path):
+        return np.zeros(0, dtype=np.int64)
+    return np.memmap(path, dtype=np.int64, mode='r')
+
+
+def mergeRuns(paths, blockSize):
+    # Yields the distinct values of sorted run files in increasing order, a block at a time. At most blockSize
+    # values of each run are read at once, so the runs never have to fit in memory together
+    runs = [np.load(path, mmap_mode='r') for path in paths]
+    positions = [0] * len(runs)
+    while True:
+        blocks = [(i, np.asarray(run[positions[i]:positions[i] + blockSize])) for i, run in enumerate(runs) if positions[i] < len(run)]
+        if not blocks:
+            return
+        # Every run's values up to the smallest block end are in its block, since the runs are sorted
+        bound = min(block[-1] for i, block in blocks)
+        parts = []
+        for i, block in blocks:
+            taken = int(np.searchsorted(block, bound, side='right'))
+            parts.append(block[:taken])
+            positions[i] += taken
+        # A stable sort of sorted pieces is a merge of them (timsort finds the pieces as runs)
+        values = np.sort(np.concatenate(parts), kind='stable')
+        yield values[np.concatenate([[True], values[1:] != values[:-1]])]
+
+
+def runPhase(directory, name, count, work):
+    # Runs the units 0..count-1 of a phase, claiming whichever are free, and returns once every unit
+    # has been done by this or another participant
+    while True:
+        pending = [unit for unit in range(count) if not os.path.exists(os.path.join(directory, name + '-' + str(unit) + '.done'))]
+        if not pending:
+            return
+        worked = False
+        for unit in pending:
+            if claim(os.path.join(directory, name + '-' + str(unit) + '.claim')):
+                markDone(os.path.join(directory, name + '-' + str(unit) + '.done'), str(work(unit)))
+                worked = True
+        if not worked:
+            time.sleep(POLL_INTERVAL)
+
+
+class Build:
+    def __init__(self, path, directory, numStates, expand, start, version, shards, chunkSize):
+        self.path, self.directory = path, directory
+        self.numStates, self.expand, self.start, self.version = numStates, expand, start, version
+        self.chunkSize = chunkSize
+        # An even shard size keeps both states of a byte in the same shard
+        self.shardSize = (-(-numStates // shards) + 1) // 2 * 2
+        self.shards = -(-numStates // self.shardSize)
+        self.depth = 0
+
+    def shardPath(self, shard):
+        return os.path.join(self.directory, 'shard-' + str(shard) + '.bin')
+
+    def depthDirectory(self, depth):
+        return os.path.join(self.directory, 'depth-' + str(depth))
+
+    def shardStates(self, shard):
+        return min(self.shardSize, self.numStates - shard*self.shardSize)
+
+    def initialize(self, unit):
+        # Creates the empty shards and the frontier at distance 0
+        start = tables.sortedUnique(np.atleast_1d(self.start).astype(np.int64))
+        os.makedirs(self.depthDirectory(0), exist_ok=True)
+        for shard in range(self.shards):
+            states = start[(start >= shard*self.shardSize) & (start < (shard+1)*self.shardSize)]
+            distances = np.memmap(self.shardPath(shard), dtype=np.uint8, mode='w+', shape=((self.shardStates(shard) + 1) // 2,))
+            distances[:] = tables.UNVISITED_NIBBLE * 17
+            tables.markNibbles(distances, states - shard*self.shardSize, 0)
+            distances.flush()
+            del distances
+            path = os.path.join(self.depthDirectory(0), 'frontier-' + str(shard) + '.bin')
+            states.tofile(path + '.' + str(os.getpid()) + '.tmp')
+            os.replace(path + '.' + str(os.getpid()) + '.tmp', path)
+        return len(start)
+
+    def expandShard(self, shard):
+        # Writes the neighbours of one frontier shard as sorted runs split by target shard
+        frontier = loadStates(os.path.join(self.depthDirectory(self.depth), 'frontier-' + str(shard) + '.bin'))
+        target = self.depthDirectory(self.depth + 1)
+        for chunk, i in enumerate(range(0, len(frontier), self.chunkSize)):
+            neighbours = tables.sortedUnique(np.asarray(self.expand(np.asarray(frontier[i:i+self.chunkSize], dtype=np.int64))).ravel())
+            bounds = np.searchsorted(neighbours, np.arange(self.shards + 1) * self.shardSize)
+            for t in range(self.shards):
+                if bounds[t+1] > bounds[t]:
+                    saveArray(os.path.join(target, 'runs-' + str(t) + '-' + str(shard) + '-' + str(chunk) + '.npy'), neighbours[bounds[t]:bounds[t+1]])
+        return len(frontier)
+
+    def mergeShard(self, shard):
+        # Merges the runs of one target shard into its next frontier and marks the new states
+        depth = self.depth + 1
+        runs = sorted(glob.glob(os.path.join(self.depthDirectory(depth), 'runs-' + str(shard) + '-*.npy')))
+        base = shard * self.shardSize
+        distances = np.memmap(self.shardPath(shard), dtype=np.uint8, mode='r+')
+        path = os.path.join(self.depthDirectory(depth), 'frontier-' + str(shard) + '.bin')
+        temporary = path + '.' + str(os.getpid()) + '.tmp'
+        found = 0
+        # Runs are read about chunkSize values at a time in all, and new states appended to the frontier as they come
+        with open(temporary, 'wb') as frontier:
+            for states in mergeRuns(runs, max(1024, self.chunkSize // max(1, len(runs)))):
+                states = states - base
+                states = states[tables.unpackNibbles(distances, states) == tables.UNVISITED_NIBBLE]
+                if len(states) and depth >= tables.UNVISITED_NIBBLE:
+                    raise ValueError('States more than ' + str(tables.UNVISITED_NIBBLE - 1) + ' moves away do not fit in 4 bits')
+                tables.markNibbles(distances, states, depth)
+                (states + base).tofile(frontier)
+                found += len(states)
+        distances.flush()
+        del distances
+        os.replace(temporary, path)
+        for run in runs:
+            os.remove(run)
+        previous = os.path.join(self.depthDirectory(depth - 1), 'frontier-' + str(shard) + '.bin')
+        if os.path.exists(previous):
+            os.remove(previous)
+        return found
+
+    def found(self, depth):
+        # States first reached at depth, read from the merge markers
+        names = ['merge-' + str(shard) + '.done' for shard in range(self.shards)] if depth else ['init-0.done']
+        total = 0
+        for name in names:
+            with open(os.path.join(self.depthDirectory(depth) if depth else self.directory, name)) as file:
+                total += int(file.read())
+        return total
+
+    def finish(self):
+        # Joins the shards into the distance file at path and deletes them
+        tables.saveDistances(self.path, (np.memmap(self.shardPath(shard), dtype=np.uint8, mode='r') for shard in range(self.shards)), self.numStates, self.version)
+        for shard in range(self.shards):
+            os.remove(self.shardPath(shard))
+        for frontier in glob.glob(os.path.join(self.directory, 'depth-*', 'frontier-*.bin')):
+            os.remove(frontier)
+
+    def participate(self):
+        os.makedirs(self.directory, exist_ok=True)
+        runPhase(self.directory, 'init', 1, self.initialize)
+        while self.found(self.depth):
+            os.makedirs(self.depthDirectory(self.depth + 1), exist_ok=True)
+            runPhase(self.depthDirectory(self.depth), 'expand', self.shards, self.expandShard)
+            runPhase(self.depthDirectory(self.depth + 1), 'merge', self.shards, self.mergeShard)
+            self.depth += 1
+        # The distance file may be left from an earlier build or not be shared by every participant, so the
+        # end of the build is read from the work directory like the other phases
+        done = os.path.join(self.directory, 'finish.done')
+        if claim(os.path.join(self.directory, 'finish.claim')):
+            self.finish()
+            markDone(done)
+        while not os.path.exists(done):
+            time.sleep(POLL_INTERVAL)
+
+
+def participate(build):
+    build.participate()
+
+
+def generateOnDisk(path, directory, numStates, expand, start, version=0, shards=16, processes=1, chunkSize=1 << 20):
+    # Builds a distance file at path with a breadth-first search kept in directory, and returns it memory-mapped
+    # path (str) : distance file to write, opened with tables.openDistances when done
+    # directory (str) : work directory, shared by every participant of the build and left holding only
+    #   small marker files at the end. It must be empty (or missing) for a new build
+    # numStates, expand, start : as for tables.generateDistances
+    # version (int) : table version written to the file
+    # shards (int) : number of state ranges, each needs about numStates / shards / 2 bytes of memory
+    #   plus its sorted runs when merged
+    # processes (int) : local processes taking part, this one included
+    # chunkSize (int) : frontier states expanded at once
+    build = Build(path, directory, numStates, expand, start, version, shards, chunkSize)
+    workers = [multiprocessing.Process(target=participate, args=(build,)) for i in range(processes - 1)]
+    for worker in workers:
+        worker.start()
+    build.participate()
+    for worker in workers:
+        worker.join()
+    return tables.openDistances(path, numStates, version)
+
+
+def tableSpecs():
+    # Tables that can be built from the command line: name -> (number of states, expand, start, version)
+    import optimal
+    import solver2x2
+    moveTables = tables.loadTable('2x2_moves', solver2x2.buildMoveTables)
+    edgeMoves = tables.loadTable('optimal_edge_moves', optimal.edgeMoveTable)
+    edgeStarts = [int(optimal.edgeCoordinate(optimal.twophase.SOLVED_EDGES, pieces)) for pieces in optimal.EDGE_GROUPS]
+    return {
+        '2x2_distances': (solver2x2.NUM_STATES, tables.ProductSpace(moveTables[0], moveTables[1, :solver2x2.NUM_TWIST6]), 0, solver2x2.TABLE_VERSION),
+        'optimal_corners': (optimal.NUM_CORNER_STATES, tables.ProductSpace(*optimal.cornerMoveTables()), 0, optimal.TABLE_VERSION),
+        'optimal_edges0': (optimal.NUM_EDGE_STATES, optimal.EdgeSpace(edgeMoves), edgeStarts[0], optimal.TABLE_VERSION),
+        'optimal_edges1': (optimal.NUM_EDGE_STATES, optimal.EdgeSpace(edgeMoves), edgeStarts[1], optimal.TABLE_VERSION),
+    }
+
+
+if __name__ == '__main__':
+    # Run the same command on every machine taking part, e.g.
+    #   python diskbfs.py optimal_corners /shared/bfs --processes 8
+    import argparse
+    parser = argparse.ArgumentParser(description='Build a distance table with a disk-backed breadth-first search')
+    parser.add_argument('table', help='one of 2x2_distances, optimal_corners, optimal_edges0, optimal_edges1')
+    parser.add_argument('directory', help='work directory shared by every participant')
+    parser.add_argument('--output', help='distance file to write, the table directory by default')
+    parser.add_argument('--shards', type=int, default=16)
+    parser.add_argument('--processes', type=int, default=1)
+    args = parser.parse_args()
+    numStates, expand, start, version = tableSpecs()[args.table]
+    t0 = time.time()
+    generateOnDisk(args.output or tables.distancePath(args.table), args.directory, numStates, expand, start, version, args.shards, args.processes)
+    print(args.table + ' built in ' + str(round(time.time() - t0, 1)) + ' s')
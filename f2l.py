@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+# F2L pair insertions by lookup
+# The pair state of a slot is corner*24 + edge, the states of its corner (slot*3 + twist) and edge
+# (slot*2 + flip) as in cross.py. With the cross and some slots solved, the shortest moves inserting
+# the pair of another slot while keeping them solved depend only on that pair state, so they are looked up:
+#   first pair   a table of the shortest insertion from every pair state of every slot, found with
+#                X-cross searches (see cross.Search) and kept on disk by tables.py
+#   later pairs  the same search also keeping the solved slots, memoized by (slot, pair state, solved slots)
+
+from functools import lru_cache
+
+import numpy as np
+
+import cross
+import tables
+from cross import CROSS_EDGES, SLOT_CORNERS, SLOT_EDGES, SOLVED_CORNERS, SOLVED_EDGES
+
+NUM_PAIR_STATES = 576
+# Longest insertion searched for, optimal ones take at most 9 moves
+MAX_INSERTION = 14
+
+
+def pairState(corners, edges, slot):
+    return corners[SLOT_CORNERS[slot]] * 24 + edges[SLOT_EDGES[slot]]
+
+
+def isPossible(slot, state, solvedSlots):
+    # False when the pair would sit on the cross or in a solved slot
+    corner, edge = state // 24 // 3, state % 24 // 2
+    return (corner not in [SLOT_CORNERS[other] for other in solvedSlots] and
+            edge not in CROSS_EDGES + [SLOT_EDGES[other] for other in solvedSlots])
+
+
+def searchInsertion(slot, state, solvedSlots):
+    # Optimal moves taking the pair of slot from state home, keeping the cross and solvedSlots solved
+    corners, edges = list(SOLVED_CORNERS), list(SOLVED_EDGES)
+    corners[SLOT_CORNERS[slot]], edges[SLOT_EDGES[slot]] = state // 24, state % 24
+    return cross.Search(corners, edges, tuple(solvedSlots) + (slot,), MAX_INSERTION).run()
+
+
+def buildInsertionTable():
+    # (4, NUM_PAIR_STATES, MAX_INSERTION + 1) move indices of the first pair insertions: column 0 holds the
+    # length, -1 for impossible states, followed by the moves
+    table = np.full((4, NUM_PAIR_STATES, MAX_INSERTION + 1), -1, dtype=np.int8)
+    for slot in range(4):
+        for state in range(NUM_PAIR_STATES):
+            if isPossible(slot, state, ()):
+                moves = searchInsertion(slot, state, ())
+                table[slot, state, 0] = len(moves)
+                table[slot, state, 1:len(moves)+1] = moves
+    return table
+
+
+@lru_cache(maxsize=None)
+def insertionTable():
+    # The table depends on MAX_INSERTION, so it is saved under a name holding it
+    return tables.loadTable('f2l_insertions_max' + str(MAX_INSERTION), buildInsertionTable).tolist()
+
+
+@lru_cache(maxsize=None)
+def insertion(slot, state, solvedSlots):
+    # Shortest insertion of the pair of slot from state as a tuple of move indices, keeping the cross and
+    # the slots in solvedSlots (a sorted tuple) solved
+    if not isPossible(slot, state, solvedSlots):
+        raise ValueError('F2L pair state ' + str(state) + ' is impossible with slots ' + str(solvedSlots) + ' solved')
+    if not solvedSlots:
+        row = insertionTable()[slot][state]
+        return tuple(row[1:row[0]+1])
+    return tuple(searchInsertion(slot, state, solvedSlots))
+
+
+if __name__ == '__main__':
+    import time
+    t0 = time.time()
+    lengths = [row[0] for slotRows in insertionTable() for row in slotRows if row[0] >= 0]
+    print('First pair table: ' + str(len(lengths)) + ' states, mean ' + str(round(sum(lengths) / len(lengths), 2)) +
+          ' moves, max ' + str(max(lengths)) + ', loaded in ' + str(round(time.time() - t0, 2)) + ' s')
+    for solvedSlots in ((1,), (1, 2), (1, 2, 3)):
+        states = [state for state in range(NUM_PAIR_STATES) if isPossible(0, state, solvedSlots)][::8]
+        t0 = time.time()
+        lengths = [len(insertion(0, state, solvedSlots)) for state in states]
+        print(str(len(solvedSlots)) + ' slots solved: mean ' + str(round(sum(lengths) / len(lengths), 2)) + ' moves, max ' +
+              str(max(lengths)) + ', ' + str(round((time.time() - t0) / len(states) * 1000, 1)) + ' ms per search')
@@ -6,7 +6,9 @@ from time import time
 import pygame
 from pygame.locals import *
 
-from cube import Cube
+import anytime
+import solverNxN
+from cube import FaceCube
 
 
 def text_objects(text, font, color=(0, 0, 0)):
@@ -44,6 +46,7 @@ def switchViewMode():
 def drawNet(cube):
     black = (0, 0, 0)
     squareSize = round(min(displayHeight, displayWidth) / 10.8 * (3 / cube.size))
+    net = cube.orientedNet()
 
     for row in range(cube.size*3):
         for col in range(cube.size*4):
@@ -63,7 +66,7 @@ def drawNet(cube):
                 pygame.draw.rect(window, black, (x, y, squareSize, squareSize), 1)
 
                 # Fill with color
-                color = config['color' + str(cube.net[row][col])]
+                color = config['color' + str(net[row][col])]
                 pygame.draw.rect(window, color, (x+1, y+1, squareSize-2, squareSize-2))
 
 
@@ -73,7 +76,7 @@ def drawCube(cube):
 
 def main():
     global cubeTurnTimeout
-    cube = Cube(20)
+    cube = FaceCube(20)
 
     # Main loop
     running = True
@@ -143,6 +146,15 @@ def main():
                     cube.turn(4, -1)
                 else:
                     cube.turn(4, 1)
+            if allKeys[pygame.K_s]:
+                # A 3x3 gets the shortest solution found within the solve deadline
+                cube.apply(anytime.solve(cube, deadline_ms=config.get('solveDeadlineMs', 500)) if cube.size == 3 else solverNxN.solve(cube))
+            for axis, key in (('x', pygame.K_x), ('y', pygame.K_y), ('z', pygame.K_z)):
+                if allKeys[key]:
+                    if allKeys[pygame.K_LSHIFT] or allKeys[pygame.K_RSHIFT]:
+                        cube.rotate(axis, -1)
+                    else:
+                        cube.rotate(axis, 1)
 
 
 if __name__ == '__main__':
@@ -178,6 +190,13 @@ if __name__ == '__main__':
     print("  L' |     L")
     print("  D  |     d")
     print("  D' |     D")
+    print("  x  |     x")
+    print("  x' |     X")
+    print("  y  |     y")
+    print("  y' |     Y")
+    print("  z  |     z")
+    print("  z' |     Z")
+    print("Solve |    s")
 
     # Go to main control loop
     main()
@@ -9,6 +9,9 @@
 import numpy as np
 import random as rand
 
+# Cached sticker permutations of cube.rotateLayer, keyed by (size, axis group, index, turn count)
+layerPermutations = {}
+
 class colors():
     BLACK = '\033[30m'
     RED = '\033[31m'
@@ -87,8 +90,11 @@ class cube():
                     print(colors.getFaceColor(self.net[row][col]) + str(self.net[row][col]) + colors.getFaceColor(9), end='  ')
             print()
 
-    def rotateLayer(self, face, index, prime=False):
+    def rotateLayer(self, face, index, prime=False, half=False):
+        # Each (face, index, turn count) is worked out once on a net of sticker indices and cached,
+        # so prime and half turns cost one gather instead of repeated quarter turns
         if face == 'U' or face == 'u' or face =='D' or face == 'd':
+            group = 'ud'
             rotCount = 3
             if prime:
                 rotCount = 1
@@ -97,34 +103,8 @@ class cube():
                 if prime:
                     rotCount = 3
                 index = self.size-1-index
-            for i in range(rotCount):
-                # Rotate Layer Horizontally
-                original = np.copy(self.net)
-                for i in range(self.size):
-                    self.net[self.size+index][self.size+i] = original[self.size+index][i]
-                    self.net[self.size+index][2*self.size+i] = original[self.size+index][self.size+i]
-                    self.net[self.size+index][3*self.size+i] = original[self.size+index][2*self.size+i]
-                    self.net[self.size+index][i] = original[self.size+index][3*self.size+i]
-                # Rotate Adjacent Face
-                if index == 0:
-                    tmpFace = np.zeros((self.size, self.size), np.int32)
-                    for row in range(self.size):
-                        for col in range(self.size, 2*self.size):
-                            tmpFace[row][col-self.size] = original[row][col]
-                    tmpFace = np.rot90(tmpFace)
-                    for row in range(self.size):
-                        for col in range(self.size):
-                            self.net[row][self.size+col] = tmpFace[row][col]
-                if index == self.size-1:
-                    tmpFace = np.zeros((self.size, self.size), np.int32)
-                    for row in range(2*self.size, 3*self.size):
-                        for col in range(self.size, 2*self.size):
-                            tmpFace[row-2*self.size][col-self.size] = original[row][col]
-                    tmpFace = np.rot90(tmpFace, 3)
-                    for row in range(self.size):
-                        for col in range(self.size):
-                            self.net[2*self.size+row][self.size+col] = tmpFace[row][col]
         elif face == 'R' or face == 'r' or face == 'L' or face == 'l':
+            group = 'rl'
             rotCount = 1
             if prime:
                 rotCount = 3
@@ -133,34 +113,8 @@ class cube():
                 if prime:
                     rotCount = 1
                 index = self.size-1-index
-            for i in range(rotCount):
-                # Rotate Layer Horizontally
-                original = np.copy(self.net)
-                for i in range(self.size):
-                    self.net[2*self.size-i-1][2*self.size-1-index] = original[3*self.size-1-i][2*self.size-1-index]
-                    self.net[self.size-i-1][2*self.size-1-index] = original[2*self.size-1-i][2*self.size-1-index]
-                    self.net[self.size+i][3*self.size+index] = original[self.size-1-i][2*self.size-1-index]
-                    self.net[3*self.size-1-i][2*self.size-1-index] = original[self.size+i][3*self.size+index]
-                # Rotate Adjacent Face
-                if index == 0:
-                    tmpFace = np.zeros((self.size, self.size), np.int32)
-                    for row in range(self.size, 2*self.size):
-                        for col in range(2*self.size, 3*self.size):
-                            tmpFace[row-self.size][col-2*self.size] = original[row][col]
-                    tmpFace = np.rot90(tmpFace, 3)
-                    for row in range(self.size):
-                        for col in range(self.size):
-                            self.net[row-2*self.size][col-2*self.size] = tmpFace[row][col]
-                if index == self.size-1:
-                    tmpFace = np.zeros((self.size, self.size), np.int32)
-                    for row in range(self.size, 2*self.size):
-                        for col in range(self.size):
-                            tmpFace[row-self.size][col] = original[row][col]
-                    tmpFace = np.rot90(tmpFace)
-                    for row in range(self.size):
-                        for col in range(self.size):
-                            self.net[row+self.size][col] = tmpFace[row][col]
         elif face == 'F' or face == 'f' or face == 'B' or face == 'b':
+            group = 'fb'
             rotCount = 1
             if prime:
                 rotCount = 3
@@ -169,33 +123,101 @@ class cube():
                 if prime:
                     rotCount = 1
                 index = self.size-1-index
+        if half:
+            rotCount = 2
+        key = (self.size, group, index, rotCount)
+        if key not in layerPermutations:
+            net = self.net
+            self.net = np.arange(self.size*self.size*12).reshape(self.size*3, self.size*4)
             for i in range(rotCount):
-                # Rotate Layer Horizontally
-                original = np.copy(self.net)
-                for i in range(self.size):
-                    self.net[self.size-1-index][self.size+i] = original[2*self.size-1-i][self.size-1-index]
-                    self.net[self.size+i][2*self.size+index] = original[self.size-1-index][self.size+i]
-                    self.net[2*self.size+index][2*self.size-1-i] = original[self.size+i][2*self.size+index]
-                    self.net[2*self.size-1-i][self.size-1-index] = original[2*self.size+index][2*self.size-1-i]
-                # Rotate Adjacent Face
-                if index == 0:
-                    tmpFace = np.zeros((self.size, self.size), np.int32)
-                    for row in range(self.size, 2*self.size):
-                        for col in range(self.size, 2*self.size):
-                            tmpFace[row-self.size][col-self.size] = original[row][col]
-                    tmpFace = np.rot90(tmpFace, 3)
-                    for row in range(self.size):
-                        for col in range(self.size):
-                            self.net[row+self.size][col+self.size] = tmpFace[row][col]
-                if index == self.size-1:
-                    tmpFace = np.zeros((self.size, self.size), np.int32)
-                    for row in range(self.size, 2*self.size):
-                        for col in range(3*self.size, 4*self.size):
-                            tmpFace[row-self.size][col-3*self.size] = original[row][col]
-                    tmpFace = np.rot90(tmpFace)
-                    for row in range(self.size):
-                        for col in range(self.size):
-                            self.net[row+self.size][col+3*self.size] = tmpFace[row][col]
+                self.rotateLayerOnce(group, index)
+            layerPermutations[key] = self.net.ravel()
+            self.net = net
+        self.net = self.net.flat[layerPermutations[key]].reshape(self.net.shape)
+
+    def rotateLayerOnce(self, group, index):
+        # One pass of the original layer rotation, turning the layer at index of the 'ud', 'rl' or 'fb' axis
+        if group == 'ud':
+            # Rotate Layer Horizontally
+            original = np.copy(self.net)
+            for i in range(self.size):
+                self.net[self.size+index][self.size+i] = original[self.size+index][i]
+                self.net[self.size+index][2*self.size+i] = original[self.size+index][self.size+i]
+                self.net[self.size+index][3*self.size+i] = original[self.size+index][2*self.size+i]
+                self.net[self.size+index][i] = original[self.size+index][3*self.size+i]
+            # Rotate Adjacent Face
+            if index == 0:
+                tmpFace = np.zeros((self.size, self.size), np.int32)
+                for row in range(self.size):
+                    for col in range(self.size, 2*self.size):
+                        tmpFace[row][col-self.size] = original[row][col]
+                tmpFace = np.rot90(tmpFace)
+                for row in range(self.size):
+                    for col in range(self.size):
+                        self.net[row][self.size+col] = tmpFace[row][col]
+            if index == self.size-1:
+                tmpFace = np.zeros((self.size, self.size), np.int32)
+                for row in range(2*self.size, 3*self.size):
+                    for col in range(self.size, 2*self.size):
+                        tmpFace[row-2*self.size][col-self.size] = original[row][col]
+                tmpFace = np.rot90(tmpFace, 3)
+                for row in range(self.size):
+                    for col in range(self.size):
+                        self.net[2*self.size+row][self.size+col] = tmpFace[row][col]
+        elif group == 'rl':
+            # Rotate Layer Horizontally
+            original = np.copy(self.net)
+            for i in range(self.size):
+                self.net[2*self.size-i-1][2*self.size-1-index] = original[3*self.size-1-i][2*self.size-1-index]
+                self.net[self.size-i-1][2*self.size-1-index] = original[2*self.size-1-i][2*self.size-1-index]
+                self.net[self.size+i][3*self.size+index] = original[self.size-1-i][2*self.size-1-index]
+                self.net[3*self.size-1-i][2*self.size-1-index] = original[self.size+i][3*self.size+index]
+            # Rotate Adjacent Face
+            if index == 0:
+                tmpFace = np.zeros((self.size, self.size), np.int32)
+                for row in range(self.size, 2*self.size):
+                    for col in range(2*self.size, 3*self.size):
+                        tmpFace[row-self.size][col-2*self.size] = original[row][col]
+                tmpFace = np.rot90(tmpFace, 3)
+                for row in range(self.size):
+                    for col in range(self.size):
+                        self.net[row-2*self.size][col-2*self.size] = tmpFace[row][col]
+            if index == self.size-1:
+                tmpFace = np.zeros((self.size, self.size), np.int32)
+                for row in range(self.size, 2*self.size):
+                    for col in range(self.size):
+                        tmpFace[row-self.size][col] = original[row][col]
+                tmpFace = np.rot90(tmpFace)
+                for row in range(self.size):
+                    for col in range(self.size):
+                        self.net[row+self.size][col] = tmpFace[row][col]
+        elif group == 'fb':
+            # Rotate Layer Horizontally
+            original = np.copy(self.net)
+            for i in range(self.size):
+                self.net[self.size-1-index][self.size+i] = original[2*self.size-1-i][self.size-1-index]
+                self.net[self.size+i][2*self.size+index] = original[self.size-1-index][self.size+i]
+                self.net[2*self.size+index][2*self.size-1-i] = original[self.size+i][2*self.size+index]
+                self.net[2*self.size-1-i][self.size-1-index] = original[2*self.size+index][2*self.size-1-i]
+            # Rotate Adjacent Face
+            if index == 0:
+                tmpFace = np.zeros((self.size, self.size), np.int32)
+                for row in range(self.size, 2*self.size):
+                    for col in range(self.size, 2*self.size):
+                        tmpFace[row-self.size][col-self.size] = original[row][col]
+                tmpFace = np.rot90(tmpFace, 3)
+                for row in range(self.size):
+                    for col in range(self.size):
+                        self.net[row+self.size][col+self.size] = tmpFace[row][col]
+            if index == self.size-1:
+                tmpFace = np.zeros((self.size, self.size), np.int32)
+                for row in range(self.size, 2*self.size):
+                    for col in range(3*self.size, 4*self.size):
+                        tmpFace[row-self.size][col-3*self.size] = original[row][col]
+                tmpFace = np.rot90(tmpFace)
+                for row in range(self.size):
+                    for col in range(self.size):
+                        self.net[row+self.size][col+3*self.size] = tmpFace[row][col]
 
     def scramble(self, turns, printNet=False):
         moves = []
@@ -232,13 +254,20 @@ class cube():
                     prime = True
                 elif i[1] in '0123456789':
                     index = int(i[1])
+            # A third character is either ' for a prime turn or 2 for a half turn (u12 is a half turn of layer 1)
+            half = False
             if len(i) > 2:
-                prime = True
-            self.rotateLayer(face, index, prime)
+                if i[2] == '2':
+                    half = True
+                else:
+                    prime = True
+            self.rotateLayer(face, index, prime, half)
             if printNet:
                 rev = ''
                 if prime:
                     rev = "'"
+                if half:
+                    rev = '2'
                 print(face.upper() + str(index) + rev)
                 self.printNet()
                 print()
\ No newline at end of file
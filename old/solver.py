@@ -1238,7 +1238,6 @@ def solveCube(cubeSize, scrambleMoves, numSolves=1):
                     print(i, end=' ')
             else:
                 solves[i] = len(solveMoves)
-            time.sleep(0.01)
         print(100*'\n')
 #        plt.xlim([min(solves)-5, max(solves)+5])
 #        plt.hist(solves, bins=np.arange(0, max(solves)), alpha=0.5)
@@ -1251,6 +1250,7 @@ def solveCube(cubeSize, scrambleMoves, numSolves=1):
         print('Mean: ' + str(sum(solves)/float(len(solves))))
         print("Stdev: " + str(round(statistics.stdev(solves), 4)))
 
-numMoves = int(input('How many moves to scramble? '))
-solveCube(3, numMoves)
-input("Press [Enter] to quit")
+if __name__ == '__main__':
+    numMoves = int(input('How many moves to scramble? '))
+    solveCube(3, numMoves)
+    input("Press [Enter] to quit")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+
+# Optimal 3x3 solver in the style of Korf's IDA*
+# The heuristic is the largest of three pattern databases, each holding the exact number of moves
+# needed to solve part of the cube:
+#   corners          8! * 3^7 = 88,179,840 states
+#   edges UR..DB     12!/6! * 2^6 = 42,577,920 states (first 6 edges, position and flip)
+#   edges DF..BR     the same for the other 6 edges
+# The databases are packed at 4 bits per state in versioned distance files (see tables.py) and
+# memory-mapped, so after the first build a solver starts in milliseconds. Building them with
+# tables.generateDistances takes a couple of minutes on one core and spreads over all cores
+
+import time
+
+import numpy as np
+
+import tables
+import twophase
+from cubie import MOVE_NAMES, CubieCube, edgeGroupMoveTable, partialPermutationRank
+
+# Bump when a coordinate or table layout changes so old files are rebuilt
+TABLE_VERSION = 1
+
+NUM_CORNER_STATES = twophase.NUM_PERM8 * twophase.NUM_TWIST
+NUM_EDGE_POSITIONS = 665280
+NUM_EDGE_STATES = NUM_EDGE_POSITIONS * 64
+
+# Edge pieces tracked by each edge database
+EDGE_GROUPS = [np.arange(6), np.arange(6, 12)]
+
+
+def edgeCoordinate(edges, pieces):
+    # positions*64 + flips of the given 6 edge pieces, bit i of the flips belonging to pieces[i]
+    slots = np.argsort(edges // 2, axis=-1)[..., pieces]
+    flips = np.take_along_axis(edges % 2, slots, axis=-1)
+    return partialPermutationRank(slots, 12) * 64 + flips @ (1 << np.arange(6))
+
+
+def edgeMoveTable():
+    # Coordinate after each move of every position rank with no flips, shaped (NUM_EDGE_POSITIONS, 18), see cubie.edgeGroupMoveTable
+    return edgeGroupMoveTable(6)
+
+
+def cornerMoveTables():
+    # The permutation and twist move tables of the two-phase solver, the corner state is perm*NUM_TWIST + twist
+    cornerMoves = tables.loadTable('twophase_corner_moves', lambda: twophase.moveTable(twophase.cornerPermCubies, lambda c, e: twophase.cornerPermCoordinate(c), twophase.NUM_PERM8), twophase.TABLE_VERSION)
+    twistMoves = tables.loadTable('twophase_twist_moves', lambda: twophase.moveTable(twophase.twistCubies, lambda c, e: twophase.twistCoordinate(c), twophase.NUM_TWIST), twophase.TABLE_VERSION)
+    return cornerMoves, twistMoves
+
+
+class EdgeSpace:
+    # Neighbours of edge group states for generateDistances, see edgeMoveTable
+    def __init__(self, edgeMoves):
+        self.edgeMoves = np.asarray(edgeMoves, dtype=np.int64)
+
+    def __call__(self, states):
+        return self.edgeMoves[states >> 6] ^ (states & 63)[:, np.newaxis]
+
+
+def buildCornerDistances():
+    return tables.generateDistances(NUM_CORNER_STATES, tables.ProductSpace(*cornerMoveTables()), 0)
+
+
+def buildEdgeDistances(edgeMoves, pieces):
+    return tables.generateDistances(NUM_EDGE_STATES, EdgeSpace(edgeMoves), int(edgeCoordinate(twophase.SOLVED_EDGES, pieces)))
+
+
+loadedTables = None
+
+
+def getTables():
+    # Loads the move tables and pattern databases, building whichever are missing
+    global loadedTables
+    if loadedTables is None:
+        t = {}
+        t['cornerMoves'], t['twistMoves'] = cornerMoveTables()
+        t['edgeMoves'] = tables.loadTable('optimal_edge_moves', edgeMoveTable)
+        t['cornerDistances'] = tables.loadDistances('optimal_corners', TABLE_VERSION, NUM_CORNER_STATES, buildCornerDistances)
+        t['edgeDistances'] = [tables.loadDistances('optimal_edges' + str(i), TABLE_VERSION, NUM_EDGE_STATES, lambda: buildEdgeDistances(t['edgeMoves'], pieces))
+                              for i, pieces in enumerate(EDGE_GROUPS)]
+        loadedTables = t
+    return loadedTables
+
+
+def tableHandles():
+    # Picklable handles to the tables for worker processes, see useTables
+    return tables.shareTables(getTables())
+
+
+def useTables(handles):
+    # Attaches tables shared by another process through tableHandles, for example as a pool initializer
+    global loadedTables
+    loadedTables = tables.attachTables(handles)
+
+
+class Search:
+    def __init__(self, corners, edges, maxLength=20, deadline=None):
+        # corners, edges (uint8 arrays) : cubie state to solve
+        # maxLength (int) : longest solution looked for
+        # deadline (float) : time.time() after which the search gives up, None to search until done
+        t = getTables()
+        self.cornerMoves, self.twistMoves = twophase.flatView(t['cornerMoves']), twophase.flatView(t['twistMoves'])
+        self.edgeMoves = twophase.flatView(t['edgeMoves'])
+        self.cornerDistances = twophase.flatView(t['cornerDistances'])
+        self.edgeDistances1, self.edgeDistances2 = (twophase.flatView(table) for table in t['edgeDistances'])
+
+        self.cornerPerm = int(twophase.cornerPermCoordinate(corners))
+        self.twist = int(twophase.twistCoordinate(corners))
+        self.edges1, self.edges2 = (int(edgeCoordinate(edges, pieces)) for pieces in EDGE_GROUPS)
+        self.solvedEdges2 = int(edgeCoordinate(twophase.SOLVED_EDGES, EDGE_GROUPS[1]))
+        self.maxLength = maxLength
+        self.deadline = deadline
+        self.path = []
+        self.solution = None
+        self.nodes = 0
+        self.seconds = 0.0
+        self.timedOut = False
+
+    def heuristic(self, cornerPerm, twist, edges1, edges2):
+        corner = cornerPerm * twophase.NUM_TWIST + twist
+        return max((self.cornerDistances[corner >> 1] >> ((corner & 1) << 2)) & 15,
+                   (self.edgeDistances1[edges1 >> 1] >> ((edges1 & 1) << 2)) & 15,
+                   (self.edgeDistances2[edges2 >> 1] >> ((edges2 & 1) << 2)) & 15)
+
+    def run(self):
+        # Returns an optimal solution as a list of move indices, or None if there is none within
+        # maxLength moves or the deadline passed first
+        t0 = time.time()
+        start = self.heuristic(self.cornerPerm, self.twist, self.edges1, self.edges2)
+        for depth in range(start, self.maxLength+1):
+            if self.search(self.cornerPerm, self.twist, self.edges1, self.edges2, depth, -1):
+                self.solution = list(self.path)
+                break
+            if self.timedOut:
+                break
+        self.seconds = time.time() - t0
+        return self.solution
+
+    def nodesPerSecond(self):
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    def search(self, cornerPerm, twist, edges1, edges2, depth, lastFace):
+        # Returns True with the solution left in self.path. Each call is one expanded node
+        self.nodes += 1
+        if depth == 0:
+            return cornerPerm == 0 and twist == 0 and edges1 == 0 and edges2 == self.solvedEdges2
+        if self.deadline is not None and self.nodes % 4096 == 0 and time.time() > self.deadline:
+            self.timedOut = True
+        if self.timedOut:
+            return False
+        cornerMoves, twistMoves, edgeMoves = self.cornerMoves, self.twistMoves, self.edgeMoves
+        cornerDistances, edgeDistances1, edgeDistances2 = self.cornerDistances, self.edgeDistances1, self.edgeDistances2
+        cornerPerm, twist = cornerPerm*18, twist*18
+        edgeRow1, edgeFlips1 = (edges1 >> 6) * 18, edges1 & 63
+        edgeRow2, edgeFlips2 = (edges2 >> 6) * 18, edges2 & 63
+        for move, face in twophase.PHASE1_NEXT[lastFace+1]:
+            newCornerPerm = cornerMoves[cornerPerm + move]
+            newTwist = twistMoves[twist + move]
+            corner = newCornerPerm * twophase.NUM_TWIST + newTwist
+            if (cornerDistances[corner >> 1] >> ((corner & 1) << 2)) & 15 >= depth:
+                continue
+            newEdges1 = edgeMoves[edgeRow1 + move] ^ edgeFlips1
+            if (edgeDistances1[newEdges1 >> 1] >> ((newEdges1 & 1) << 2)) & 15 >= depth:
+                continue
+            newEdges2 = edgeMoves[edgeRow2 + move] ^ edgeFlips2
+            if (edgeDistances2[newEdges2 >> 1] >> ((newEdges2 & 1) << 2)) & 15 >= depth:
+                continue
+            self.path.append(move)
+            if self.search(newCornerPerm, newTwist, newEdges1, newEdges2, depth-1, face):
+                return True
+            self.path.pop()
+        return False
+
+
+def search(cube, maxLength=20, timeout=None):
+    # Runs an optimal search on a 3x3 cube.Cube or cubie.CubieCube and returns the finished Search,
+    # which holds the solution (move indices or None), nodes expanded, seconds and nodesPerSecond()
+    state = cube if isinstance(cube, CubieCube) else CubieCube.fromCube(cube)
+    twophase.verify(state.corners, state.edges)
+    result = Search(state.corners, state.edges, maxLength, None if timeout is None else time.time() + timeout)
+    result.run()
+    return result
+
+
+def solve(cube, maxLength=20, timeout=None):
+    # Optimal solution as a list of moves such as ['R', "U'", 'F2'], or None if none was found in time
+    solution = search(cube, maxLength, timeout).solution
+    return None if solution is None else [MOVE_NAMES[move] for move in solution]
+
+
+if __name__ == '__main__':
+    from cube import CubeBatch
+    getTables()
+    batch = CubeBatch(3, 1)
+    batch.scramble(12, seed=1)
+    result = search(batch.getCube(0))
+    print(' '.join(MOVE_NAMES[move] for move in result.solution) + ' (' + str(len(result.solution)) + ' moves, ' + str(result.nodes) + ' nodes in ' +
+          str(round(result.seconds, 3)) + ' s)')
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+# Peephole optimizer for 3x3 move sequences
+# Every window of up to MAX_WINDOW consecutive face turns is composed into a cubie state and looked up
+# in a table of the optimal sequence reaching each state within TABLE_DEPTH moves of solved (621,649
+# states). A window whose state has a shorter optimal sequence is replaced by it, taking the biggest
+# saving first, and the windows are scanned again until no replacement shortens the sequence.
+# Lengths are in the half turn metric. Wide and slice turns are kept as they are and no window
+# crosses them, since on a 3x3 they also turn the centers
+# The table is keyed by a 64 bit hash of the corner and edge coordinates, so a hit is checked by
+# composing the sequence found before it is used
+
+from functools import lru_cache
+
+import numpy as np
+
+import tables
+import twophase
+from cube import formatMoves, simplifyMoves
+from cubie import MOVE_CORNERS, MOVE_EDGES, MOVE_NAMES, multiplyCubies, permutationRank
+
+TABLE_DEPTH = 5
+MAX_WINDOW = 7
+# Move index of each face turn (side, direction) of a 3x3
+MOVE_INDEX = {(move // 3, (1, 2, -1)[move % 3]): move for move in range(18)}
+
+
+def stateKeys(corners, edges):
+    # uint64 hash of cubie states, the edge coordinate times the number of corner states plus the corner
+    # coordinate, wrapping around 2^64
+    cornerKeys = (twophase.cornerPermCoordinate(corners) * twophase.NUM_TWIST + twophase.twistCoordinate(corners)).astype(np.uint64)
+    edgeKeys = (permutationRank(edges // 2) * twophase.NUM_FLIP + twophase.flipCoordinate(edges)).astype(np.uint64)
+    return edgeKeys * np.uint64(twophase.NUM_PERM8 * twophase.NUM_TWIST) + cornerKeys
+
+
+@lru_cache(maxsize=None)
+def buildTable():
+    # (keys, moves): the sorted keys of every state within TABLE_DEPTH moves and, on the same row, the
+    # move indices of an optimal sequence reaching it padded with -1. Sequences grow breadth first, so
+    # the first one reaching a state is optimal
+    corners, edges = twophase.SOLVED_CORNERS[np.newaxis].astype(np.uint8), twophase.SOLVED_EDGES[np.newaxis].astype(np.uint8)
+    paths = np.full((1, TABLE_DEPTH), -1, dtype=np.int8)
+    lastFaces = np.array([-1])
+    keys = [stateKeys(corners, edges)]
+    allPaths = [paths]
+    seen = keys[0]
+    for depth in range(TABLE_DEPTH):
+        nextCorners, nextEdges, nextPaths, nextFaces = [], [], [], []
+        for move in range(18):
+            face = move // 3
+            keep = (lastFaces != face) & (lastFaces != face + 3)
+            moveCorners, moveEdges = multiplyCubies(corners[keep], edges[keep], MOVE_CORNERS[move], MOVE_EDGES[move])
+            movePaths = paths[keep].copy()
+            movePaths[:, depth] = move
+            nextCorners.append(moveCorners)
+            nextEdges.append(moveEdges)
+            nextPaths.append(movePaths)
+            nextFaces.append(np.full(len(movePaths), face))
+        corners, edges, paths, lastFaces = (np.concatenate(arrays) for arrays in (nextCorners, nextEdges, nextPaths, nextFaces))
+        frontierKeys = stateKeys(corners, edges)
+        # Keep the first sequence of each new state
+        order = np.argsort(frontierKeys, kind='stable')
+        first = np.concatenate([[True], frontierKeys[order[1:]] != frontierKeys[order[:-1]]])
+        new = order[first]
+        new = new[~np.isin(frontierKeys[new], seen)]
+        new.sort()
+        corners, edges, paths, lastFaces = corners[new], edges[new], paths[new], lastFaces[new]
+        keys.append(frontierKeys[new])
+        allPaths.append(paths)
+        seen = np.concatenate([seen, frontierKeys[new]])
+    keys, paths = np.concatenate(keys), np.concatenate(allPaths)
+    order = np.argsort(keys, kind='stable')
+    return keys[order], paths[order]
+
+
+@lru_cache(maxsize=None)
+def getTables():
+    # Both tables depend on TABLE_DEPTH, so they are saved under names holding it
+    keys = tables.loadTable('peephole_keys_depth' + str(TABLE_DEPTH), lambda: buildTable()[0])
+    moves = tables.loadTable('peephole_moves_depth' + str(TABLE_DEPTH), lambda: buildTable()[1])
+    return keys, moves
+
+
+def composeMoves(moves):
+    # Cubie state reached from solved by a list of move indices
+    corners, edges = twophase.SOLVED_CORNERS.astype(np.uint8), twophase.SOLVED_EDGES.astype(np.uint8)
+    for move in moves:
+        corners, edges = multiplyCubies(corners, edges, MOVE_CORNERS[move], MOVE_EDGES[move])
+    return corners, edges
+
+
+def bestReplacement(moves, window):
+    # (start, length, replacement) of the window of moves (a list of move indices) with the biggest saving, or None
+    keys, table = getTables()
+    count = len(moves)
+    moves = np.array(moves)
+    corners = np.tile(twophase.SOLVED_CORNERS.astype(np.uint8), (count, 1))
+    edges = np.tile(twophase.SOLVED_EDGES.astype(np.uint8), (count, 1))
+    candidates = []
+    for length in range(1, min(window, count) + 1):
+        # Row i holds the state of the window of this length starting at move i
+        starts = count - length + 1
+        corners, edges = multiplyCubies(corners[:starts], edges[:starts], MOVE_CORNERS[moves[length-1:]], MOVE_EDGES[moves[length-1:]])
+        if length < 2:
+            continue
+        windowKeys = stateKeys(corners, edges)
+        rows = np.minimum(np.searchsorted(keys, windowKeys), len(keys) - 1)
+        found = np.flatnonzero(keys[rows] == windowKeys)
+        lengths = (table[rows[found]] >= 0).sum(axis=1)
+        for start, row, optimal in zip(found.tolist(), rows[found].tolist(), lengths.tolist()):
+            if optimal < length:
+                candidates.append((length - optimal, -start, length, row, corners[start], edges[start]))
+    for saving, start, length, row, windowCorners, windowEdges in sorted(candidates, key=lambda candidate: candidate[:2], reverse=True):
+        replacement = [move for move in table[row].tolist() if move >= 0]
+        corners, edges = composeMoves(replacement)
+        if (corners == windowCorners).all() and (edges == windowEdges).all():
+            return -start, length, replacement
+    return None
+
+
+def optimizeFaceTurns(moves, window):
+    # Repeatedly replaces the best window of a list of move indices until none is shorter
+    while True:
+        replacement = bestReplacement(moves, window)
+        if replacement is None:
+            return moves
+        start, length, shorter = replacement
+        turns = simplifyMoves([MOVE_NAMES[move] for move in moves[:start] + shorter + moves[start+length:]], 3)
+        moves = [MOVE_INDEX[side, direction] for side, direction, depth, width in turns]
+
+
+def optimize(moves, window=MAX_WINDOW):
+    # Shortens a 3x3 move sequence without changing what it does
+    # moves (str, list of str or turns) : see cube.parseMoves
+    # window (int) : most face turns replaced at once, up to TABLE_DEPTH + 2 can find savings
+    # Returns the moves as a list such as ['R', "U'", 'Rw2']
+    turns = simplifyMoves(moves, 3)
+    result, run = [], []
+    for side, direction, depth, width in turns + ((None, None, None, None),):
+        if side is not None and depth == 0 and width == 1:
+            run.append(MOVE_INDEX[side, direction])
+            continue
+        if run:
+            result += [MOVE_NAMES[move] for move in optimizeFaceTurns(run, window)]
+            run = []
+        if side is not None:
+            result += formatMoves(((side, direction, depth, width),)).split()
+    return formatMoves(simplifyMoves(result, 3)).split()
+
+
+if __name__ == '__main__':
+    import solver
+    from cube import CubeBatch
+    batch = CubeBatch(3, 1)
+    batch.scramble(30, seed=1)
+    moves = solver.solve(batch.getCube(0))
+    shorter = optimize(moves)
+    print('CFOP solution of ' + str(len(moves)) + ' moves shortened to ' + str(len(shorter)) + ': ' + ' '.join(shorter))
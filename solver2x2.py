@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+# Optimal 2x2 solver
+# The DBL corner is held still and the cube is turned with U, F and R only, so a state is the
+# permutation of the other 7 corners and the twist of 6 of them: 5040 * 729 = 3,674,160 states.
+# The distance to solved of every state is kept on disk at 4 bits per state, and a solve is a walk
+# down that table, one lookup per candidate move
+
+import numpy as np
+
+import tables
+from cubie import CORNER_LOOKUP, MOVE_CORNERS, MOVE_NAMES, cornerFacelets, permutationFromRank, permutationRank
+
+NUM_PERM7 = 5040
+NUM_TWIST6 = 729
+NUM_STATES = NUM_PERM7 * NUM_TWIST6
+
+# Bump when the state numbering changes so old distance files are rebuilt
+TABLE_VERSION = 1
+
+# U U2 U' F F2 F' R R2 R' as indices into MOVE_NAMES
+MOVES = list(range(9))
+# Corner slots other than DBL (6)
+FREE_SLOTS = [0, 1, 2, 3, 4, 5, 7]
+
+
+def stateOfCorners(corners):
+    # State index of (..., 8) corner arrays (permutation*3 + orientation) with DBL solved
+    cp, co = corners[..., FREE_SLOTS] // 3, corners[..., :6] % 3
+    return permutationRank(np.where(cp == 7, 6, cp)) * NUM_TWIST6 + co @ (3 ** np.arange(5, -1, -1))
+
+
+def cornersOfState(states):
+    # Inverse of stateOfCorners
+    perms, twists = np.divmod(np.asarray(states), NUM_TWIST6)
+    cp = permutationFromRank(perms, 7)
+    cp = np.insert(np.where(cp == 6, 7, cp), 6, 6, axis=-1)
+    co = twists[..., np.newaxis] // (3 ** np.arange(5, -1, -1)) % 3
+    co = np.concatenate([co, np.zeros(co.shape[:-1] + (1,), dtype=co.dtype), (-co.sum(axis=-1, keepdims=True)) % 3], axis=-1)
+    return cp * 3 + co
+
+
+def buildMoveTables():
+    # Permutation and twist parts of a state move independently
+    corners = cornersOfState(np.arange(NUM_PERM7) * NUM_TWIST6)
+    permMoves = np.empty((NUM_PERM7, len(MOVES)), dtype=np.uint16)
+    for i, move in enumerate(MOVES):
+        permMoves[:, i] = stateOfCorners(corners[:, MOVE_CORNERS[move] // 3]) // NUM_TWIST6
+    corners = cornersOfState(np.arange(NUM_TWIST6))
+    twistMoves = np.empty((NUM_TWIST6, len(MOVES)), dtype=np.uint16)
+    for i, move in enumerate(MOVES):
+        moved = corners[:, MOVE_CORNERS[move] // 3]
+        twisted = moved // 3 * 3 + (moved % 3 + MOVE_CORNERS[move] % 3) % 3
+        twistMoves[:, i] = stateOfCorners(twisted) % NUM_TWIST6
+    return np.stack([permMoves, np.pad(twistMoves, ((0, NUM_PERM7 - NUM_TWIST6), (0, 0)))])
+
+
+def buildDistances(moveTables):
+    return tables.generateDistances(NUM_STATES, tables.ProductSpace(moveTables[0], moveTables[1, :NUM_TWIST6]), 0)
+
+
+loadedTables = None
+# Python lists and a memoryview of loadedTables for the table walk
+walkTables = None
+
+
+def getTables():
+    # (permMoves, twistMoves, distances) with distances as a memoryview of the packed table
+    global loadedTables, walkTables
+    if loadedTables is None:
+        moveTables = tables.loadTable('2x2_moves', buildMoveTables)
+        distances = tables.loadDistances('2x2_distances', TABLE_VERSION, NUM_STATES, lambda: buildDistances(moveTables))
+        loadedTables = {'moves': moveTables, 'distances': distances}
+    if walkTables is None:
+        moveTables = loadedTables['moves']
+        walkTables = (moveTables[0].tolist(), moveTables[1, :NUM_TWIST6].tolist(), memoryview(loadedTables['distances']))
+    return walkTables
+
+
+def tableHandles():
+    # Picklable handles to the tables for worker processes, see useTables
+    getTables()
+    return tables.shareTables(loadedTables)
+
+
+def useTables(handles):
+    # Attaches tables shared by another process through tableHandles, for example as a pool initializer
+    global loadedTables, walkTables
+    loadedTables, walkTables = tables.attachTables(handles), None
+
+
+def readCorners(net):
+    # Corner array of a 2x2 net. There are no centers, so colors are matched to sides through the
+    # corner in DBL: its colors become D, B and L and their opposite colors U, F and R
+    facelets = cornerFacelets(2)
+    colors = np.asarray(net).flat[facelets.ravel()].astype(np.intp).reshape(8, 3)
+    sideOfColor = np.empty(6, dtype=np.intp)
+    sideOfColor[colors[6]] = [3, 4, 5]
+    sideOfColor[(colors[6] + 3) % 6] = [0, 1, 2]
+    sides = sideOfColor[colors]
+    twist = np.argmax((sides == 0) | (sides == 3), axis=1)
+    turned = sides[np.arange(8)[:, np.newaxis], (twist[:, np.newaxis] + np.arange(3)) % 3]
+    pieces = CORNER_LOOKUP[turned @ [36, 6, 1]]
+    if (pieces < 0).any() or sorted(pieces.tolist()) != list(range(8)) or twist.sum() % 3:
+        raise ValueError('Net does not hold valid 2x2 corners')
+    return pieces * 3 + twist
+
+
+def distance(cube):
+    # Number of moves in an optimal solution of a 2x2 cube.Cube
+    permMoves, twistMoves, distances = getTables()
+    state = int(stateOfCorners(readCorners(cube.orientedNet())))
+    return (distances[state >> 1] >> ((state & 1) << 2)) & 15
+
+
+def solve(cube):
+    # Optimal solution of a 2x2 cube.Cube as a list of moves such as ['R', "U'", 'F2']
+    permMoves, twistMoves, distances = getTables()
+    state = int(stateOfCorners(readCorners(cube.orientedNet())))
+    perm, twist = divmod(state, NUM_TWIST6)
+    remaining = (distances[state >> 1] >> ((state & 1) << 2)) & 15
+    solution = []
+    while remaining:
+        for i, move in enumerate(MOVES):
+            nextPerm, nextTwist = permMoves[perm][i], twistMoves[twist][i]
+            nextState = nextPerm * NUM_TWIST6 + nextTwist
+            if (distances[nextState >> 1] >> ((nextState & 1) << 2)) & 15 == remaining - 1:
+                break
+        solution.append(MOVE_NAMES[move])
+        perm, twist, remaining = nextPerm, nextTwist, remaining - 1
+    return solution
+
+
+if __name__ == '__main__':
+    import time
+    from cube import CubeBatch
+    getTables()
+    batch = CubeBatch(2, 1)
+    batch.scramble(30, seed=1)
+    t0 = time.time()
+    solution = solve(batch.getCube(0))
+    print(' '.join(solution) + ' (' + str(len(solution)) + ' moves in ' + str(round(1e6*(time.time()-t0), 1)) + ' us)')
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+
+# NxN solver based on the reduction method, for any size
+# The cube is split into the 3x3 (odd sizes) or 2x2 (even sizes) made of its corners, middle edges
+# and fixed centers, and orbits of 24 pieces that only ever swap among themselves: the center
+# pieces at each place of a face and the edge wings at each depth. It is solved in four steps:
+#   3x3      the corners and middle edges, solved as a 3x3 by solver.py (or as a 2x2 by solver2x2.py)
+#            with each of its turns widened to the matching NxN layers
+#   parity   3-cycles only make even permutations, so each wing orbit in an odd one gets a quarter
+#            turn of its inner layer. That only moves centers, which are solved next
+#   centers  each orbit is put in place with 3-cycles
+#   edges    each wing orbit is put in place with 3-cycles, pairing every edge
+# The 3-cycles are commutators of inner layers and face turns, conjugated by whole cube rotations and
+# setup turns. They are built once in the labels of a small reference cube, so an orbit is solved
+# with a couple dozen lookups whatever the size, and solving takes time linear in the number of
+# pieces. Doing the 3x3 first means the 3-cycles never disturb it, so no big cube parity algorithms
+# are needed
+
+from functools import lru_cache
+
+import numpy as np
+
+import solver
+import solver2x2
+from cube import SIDE_NORMALS, SIDE_OFFSETS, Cube, compileAlgorithm, formatMoves, invertMoves, netIndexOf, parseMoves, rotationMatrix, simplifyMoves, stickerGeometry, stickerSides
+from symmetry import SYMMETRIES, transformMoves
+
+# Orbit pieces are labeled by the rotation taking the orbit's first piece to them
+ROTATIONS = SYMMETRIES[:24]
+FACE_TURNS = tuple((side, direction, 0, 1) for side in range(6) for direction in (1, 2, -1))
+# Faces whose centers are solved first
+CENTER_ORDER = [0, 3, 1, 4, 2, 5]
+
+
+def layers(points, side, size):
+    # Layer of side holding each point, counted from the face as in cube.turnPermutation
+    return np.minimum((size - points @ SIDE_NORMALS[side]) // 2, size-1)
+
+
+def centerCommutator(a, b):
+    # r U l' U' r' U l U' with r layer a of R and l layer b of L, a 3-cycle of centers when they are different inner layers
+    return ((2, 1, a, 1), (0, 1, 0, 1), (5, -1, b, 1), (0, -1, 0, 1), (2, -1, a, 1), (0, 1, 0, 1), (5, 1, b, 1), (0, -1, 0, 1))
+
+
+def wingCommutator(k):
+    # l U R' U' l' U R U' with l layer k of L, a 3-cycle of the wings in that layer
+    return ((5, 1, k, 1), (0, 1, 0, 1), (2, -1, 0, 1), (0, -1, 0, 1), (5, -1, k, 1), (0, 1, 0, 1), (2, 1, 0, 1), (0, -1, 0, 1))
+
+
+def centerOrbits(size):
+    # (points, base, depths) of every center orbit: the doubled point of a U sticker, see cube.stickerGeometry,
+    # the commutator cycling it and its inner layers. The point is the U sticker both layers of the commutator go through
+    quarterTurn = rotationMatrix(SIDE_NORMALS[0], 1)
+    seen = set()
+    orbits = []
+    for x in range(3-size, size-2, 2):
+        for z in range(3-size, size-2, 2):
+            if (x, z) in seen or (x, z) == (0, 0):
+                continue
+            images = [(x, z), (z, -x), (-x, -z), (-z, x)]
+            seen.update(images)
+            for imageX, imageZ in images:
+                point = np.array([imageX, size, imageZ])
+                a, b = int(layers(point, 2, size)), int(layers(quarterTurn @ point, 5, size))
+                if a + b != size - 1:
+                    orbits.append((point[np.newaxis], centerCommutator(a, b), (a, b)))
+                    break
+    return orbits
+
+
+def wingOrbits(size):
+    # (points, base, depths) of every wing orbit but the middle edges: the U and F stickers of the UF wing in layer k of L
+    return [(np.array([[2*k+1-size, size, size-1], [2*k+1-size, size-1, size]]), wingCommutator(k), (k,)) for k in range(1, (size-2)//2 + 1)]
+
+
+def orbitSignature(size, depths):
+    # Which inner layers of an orbit coincide. Orbits with the same signature are cycled by the same
+    # turns in the same labels whatever the size, only the depths differ
+    return tuple((first == second, first + second == size - 1) for first in depths for second in depths)
+
+
+def orbitPositions(size, points):
+    # (24, stickers) flat net indices of the pieces of an orbit, row g holding rotation g of points
+    rotated = np.einsum('gij,pj->gpi', ROTATIONS, points)
+    return netIndexOf(size, rotated)
+
+
+def normalizedCycle(cycle):
+    first = cycle.index(min(cycle))
+    return cycle[first:] + cycle[:first]
+
+
+@lru_cache(maxsize=None)
+def cycleLibrary(kind, signature):
+    # Every 3-cycle of the 24 pieces of an orbit as (setup, rotation, inverse): the base commutator, inverted or not,
+    # conjugated by a whole cube rotation and then by a setup of face turns and turns of the orbit's inner layers.
+    # Found with a breadth-first search over setups on the smallest cube with an orbit of the same signature
+    # kind (str) : 'centers' or 'wings'
+    # signature (tuple) : see orbitSignature
+    # Returns (depths, library): the inner layers of the reference orbit, which setups refer to, and a dict
+    # (source, target) -> list of (setup length, third label, entry), shortest setups first
+    size, (points, base, depths) = next((size, orbit) for size in range(4, 9) for orbit in (centerOrbits if kind == 'centers' else wingOrbits)(size)
+                                        if orbitSignature(size, orbit[2]) == signature)
+    positions = orbitPositions(size, points)
+    labelOf = np.full(size*size*12, -1, dtype=np.intp)
+    labelOf[positions[:, 0]] = np.arange(24)
+
+    def action(moves):
+        # Label each piece goes to
+        return labelOf[compileAlgorithm(size, invertMoves(moves))[positions[:, 0]]]
+
+    entries = {}
+    frontier = []
+    for rotation in range(24):
+        for inverse in (False, True):
+            moves = transformMoves(invertMoves(base) if inverse else base, rotation)
+            moved = action(moves)
+            changed = np.flatnonzero(moved != np.arange(24))
+            stickers = np.flatnonzero(compileAlgorithm(size, moves) != np.arange(size*size*12))
+            if len(changed) != 3 or len(stickers) != 3 * points.shape[0]:
+                raise ValueError(kind + ' algorithm ' + formatMoves(moves) + ' is not a 3-cycle on a ' + str(size) + 'x' + str(size) + ' cube')
+            cycle = normalizedCycle((int(changed[0]), int(moved[changed[0]]), int(moved[moved[changed[0]]])))
+            if cycle not in entries:
+                entries[cycle] = ((), rotation, inverse)
+                frontier.append(cycle)
+    setupTurns = FACE_TURNS + tuple((side, direction, depth, 1) for depth in sorted(set(depths)) for side in range(6) for direction in (1, 2, -1))
+    setupActions = [action((turn,)) for turn in setupTurns]
+    while frontier:
+        following = []
+        for cycle in frontier:
+            setup, rotation, inverse = entries[cycle]
+            for turn, moved in zip(setupTurns, setupActions):
+                image = normalizedCycle(tuple(int(moved[label]) for label in cycle))
+                if image not in entries:
+                    entries[image] = (invertMoves((turn,)) + setup, rotation, inverse)
+                    following.append(image)
+        frontier = following
+    if len(entries) != 24*23*22 // 3:
+        raise RuntimeError('Setups of ' + kind + ' algorithm ' + formatMoves(base) + ' reach ' + str(len(entries)) + ' of the ' +
+                           str(24*23*22 // 3) + ' 3-cycles of the orbit')
+    library = {}
+    for (first, second, third), entry in entries.items():
+        for source, target, other in ((first, second, third), (second, third, first), (third, first, second)):
+            library.setdefault((source, target), []).append((len(entry[0]), other, entry))
+    for candidates in library.values():
+        candidates.sort(key=lambda candidate: candidate[:2])
+    return depths, library
+
+
+def cycleMoves(entry, base, depths, referenceDepths):
+    # Turns of a cycleLibrary entry for an orbit with the given base commutator and inner layers
+    setup, rotation, inverse = entry
+    layer = dict(zip(referenceDepths, depths))
+    layer[0] = 0
+    setup = tuple((side, direction, layer[depth], width) for side, direction, depth, width in setup)
+    return setup + transformMoves(invertMoves(base) if inverse else base, rotation) + invertMoves(setup)
+
+
+def solveOrbit(colors, wanted, library, order):
+    # Entries of cycleLibrary that move every wanted color into place, fixing the labels in order
+    # Each step brings a matching piece to the next label with the cheapest cycle whose third piece is not fixed yet
+    colors = list(colors)
+    fixed = set()
+    cycles = []
+    for target in order:
+        if colors[target] != wanted[target]:
+            best = None
+            for source in range(24):
+                if source == target or source in fixed or colors[source] != wanted[target]:
+                    continue
+                for length, other, entry in library[(source, target)]:
+                    if other not in fixed:
+                        if best is None or length < best[0]:
+                            best = (length, source, other, entry)
+                        break
+            if best is None:
+                raise ValueError('Orbit cannot be solved with 3-cycles, the cube is not valid')
+            length, source, other, entry = best
+            colors[target], colors[other], colors[source] = colors[source], colors[target], colors[other]
+            cycles.append(entry)
+        fixed.add(target)
+    return cycles
+
+
+def permutationParity(perm):
+    parity, seen = 0, set()
+    for start in range(len(perm)):
+        length = 0
+        while start not in seen:
+            seen.add(start)
+            start = perm[start]
+            length += 1
+        parity ^= max(length - 1, 0) & 1
+    return parity
+
+
+def wingColors(net, positions, targets, size):
+    # Colors of each wing as first*6 + second sticker, and the colors wanted there
+    colors = np.asarray(net).flat[positions].astype(np.intp)
+    sides = stickerSides(size)[positions].astype(np.intp)
+    return (colors @ [6, 1]).tolist(), (targets[sides] @ [6, 1]).tolist()
+
+
+def solveSkeleton(cube):
+    # Turns solving the corners, middle edges and fixed centers of a big cube, as NxN turns
+    size = cube.size
+    small = 3 if size % 2 else 2
+    picked = [0, size // 2, size - 1] if small == 3 else [0, size - 1]
+    skeleton = Cube(small)
+    for side, (row, col) in enumerate(SIDE_OFFSETS):
+        block = cube.net[row*size:(row+1)*size, col*size:(col+1)*size]
+        skeleton.net[row*small:(row+1)*small, col*small:(col+1)*small] = block[np.ix_(picked, picked)]
+    moves = (solver if small == 3 else solver2x2).solve(skeleton)
+    return tuple((side, direction, picked[depth], picked[depth+width-1] - picked[depth] + 1) for side, direction, depth, width in parseMoves(moves))
+
+
+def solveTurns(cube):
+    # Solution of a cube.Cube of size 4 or more as (side, direction, depth, width) turns, see solve
+    size = cube.size
+    work = Cube(size)
+    work.net = cube.orientedNet().copy()
+    turns = list(solveSkeleton(work))
+    work.apply(turns)
+    targets = np.array([work.net[row*size, col*size] for row, col in SIDE_OFFSETS], dtype=np.intp)
+
+    wings = []
+    for points, base, depths in wingOrbits(size):
+        positions = orbitPositions(size, points)
+        colors, wanted = wingColors(work.net, positions, targets, size)
+        if sorted(colors) != sorted(wanted):
+            raise ValueError('Edge wings do not match the corners, the cube is not valid')
+        if permutationParity([wanted.index(color) for color in colors]):
+            parity = ((5, 1, depths[0], 1),)
+            work.apply(parity)
+            turns += parity
+            colors, wanted = wingColors(work.net, positions, targets, size)
+        wings.append((colors, wanted, base, depths))
+
+    for points, base, depths in centerOrbits(size):
+        referenceDepths, library = cycleLibrary('centers', orbitSignature(size, depths))
+        positions = orbitPositions(size, points)[:, 0]
+        colors = work.net.flat[positions].tolist()
+        sides = stickerSides(size)[positions]
+        order = sorted(range(24), key=lambda label: CENTER_ORDER.index(sides[label]))
+        for entry in solveOrbit(colors, targets[sides].tolist(), library, order):
+            turns += cycleMoves(entry, base, depths, referenceDepths)
+
+    for colors, wanted, base, depths in wings:
+        referenceDepths, library = cycleLibrary('wings', orbitSignature(size, depths))
+        for entry in solveOrbit(colors, wanted, library, range(24)):
+            turns += cycleMoves(entry, base, depths, referenceDepths)
+    return simplifyMoves(turns, size)
+
+
+def solve(cube):
+    # Solves a cube.Cube (or FaceCube) of any size, returning the moves as a list such as ['R', '3Fw', "5U'"]
+    # in the cube's orientation frame. Sizes 2 and 3 go to solver2x2 and solver directly
+    if cube.size == 1:
+        return []
+    if cube.size == 2:
+        return solver2x2.solve(cube)
+    if cube.size == 3:
+        return solver.solve(cube)
+    return formatMoves(solveTurns(cube)).split()
+
+
+if __name__ == '__main__':
+    import time
+    from cube import FaceCube
+    rng = np.random.default_rng(1)
+    for size in (4, 5, 6, 7, 10, 15, 20, 30):
+        cube = FaceCube(size)
+        for i in range(20 * size):
+            cube.turn(int(rng.integers(6)), int(rng.choice([-1, 1, 2])), int(rng.integers(size - 1)))
+        t0 = time.time()
+        moves = solve(cube)
+        seconds = time.time() - t0
+        cube.apply(moves)
+        assert cube.isSolved()
+        print(str(size) + 'x' + str(size) + ': ' + str(len(moves)) + ' moves in ' + str(round(seconds, 3)) + ' s')
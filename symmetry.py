@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+# Canonical keys of cube states under the 48 symmetries of the cube
+# A symmetry is a rotation or reflection g of the whole cube. Conjugating a state by it moves every
+# sticker from point p to g p and recolors it with the side its color's normal is sent to, which is
+# the state reached by the scramble seen through g (see transformMoves). The canonical key of a
+# state is the smallest of its 48 conjugates, each packed at 3 bits per sticker in stickerGeometry
+# order, so states equal up to symmetry share a key and tables or caches keyed by it shrink by up to 48x.
+# With colors=True any relabeling of the 6 colors is ignored as well: each conjugate numbers its
+# colors in order of first appearance before it is packed
+
+from functools import lru_cache
+from itertools import permutations, product
+
+import numpy as np
+
+from cube import SIDE_NORMALS, Cube, CubeBatch, netIndexOf, stickerGeometry
+
+# Cubes canonicalized at once by canonicalize, bounds the (chunk, 48, stickers) temporaries
+CHUNK_SIZE = 1024
+# 3 bit stickers in one uint64 word of a key
+STICKERS_PER_WORD = 21
+WORD_SHIFTS = np.arange(STICKERS_PER_WORD-1, -1, -1, dtype=np.uint64) * np.uint64(3)
+
+
+def symmetryMatrices():
+    # The 48 signed permutation matrices, the identity first and the 24 rotations before the reflections
+    matrices = [np.eye(3, dtype=int)[list(axes)] * np.array(signs)[:, np.newaxis]
+                for axes in permutations(range(3)) for signs in product((1, -1), repeat=3)]
+    matrices.sort(key=lambda matrix: (-round(np.linalg.det(matrix)), not (matrix == np.eye(3)).all()))
+    return np.array(matrices)
+
+
+SYMMETRIES = symmetryMatrices()
+# Index of the inverse of each symmetry and side each side is sent to by each symmetry
+INVERSE_SYMMETRY = np.array([next(j for j, other in enumerate(SYMMETRIES) if (other @ matrix == np.eye(3)).all()) for matrix in SYMMETRIES])
+SYMMETRY_SIDES = np.array([[next(s for s in range(6) if (SIDE_NORMALS[s] == matrix @ normal).all()) for normal in SIDE_NORMALS] for matrix in SYMMETRIES])
+# SYMMETRY_SIDES as uint8 for recoloring stickers
+SYMMETRY_COLORS = SYMMETRY_SIDES.astype(np.uint8)
+# -1 for reflections, which turn clockwise turns counterclockwise
+SYMMETRY_SIGNS = np.round(np.linalg.det(SYMMETRIES)).astype(int)
+
+
+@lru_cache(maxsize=None)
+def symmetryPermutations(size):
+    # (48, 6*size*size) flat net indices: conjugate s of a net has the color of net.flat[perms[s, i]]
+    # on sticker i (in stickerGeometry order), mapped through SYMMETRY_SIDES[s]
+    netIndex, points = stickerGeometry(size)
+    perms = np.stack([netIndexOf(size, points @ matrix) for matrix in SYMMETRIES])
+    perms.flags.writeable = False
+    return perms
+
+
+def conjugateNets(nets, symmetry):
+    # Conjugates of a stack of nets by one symmetry, as whole nets (canonicalize only packs the stickers)
+    nets = np.asarray(nets)
+    size = nets.shape[-1] // 4
+    flat = nets.reshape(-1, size*size*12)
+    conjugated = flat.copy()
+    conjugated[:, stickerGeometry(size)[0]] = SYMMETRY_COLORS[symmetry][flat[:, symmetryPermutations(size)[symmetry]]]
+    return conjugated.reshape(nets.shape)
+
+
+def transformMoves(moves, symmetry):
+    # Turns (see cube.parseMoves) that do to conjugate symmetry what moves do to the original state
+    return tuple((int(SYMMETRY_SIDES[symmetry, side]), direction if direction == 2 else direction * int(SYMMETRY_SIGNS[symmetry]), depth, width)
+                 for side, direction, depth, width in moves)
+
+
+def firstAppearance(stickers):
+    # Renumbers the colors of each row of stickers by the order they first appear in
+    present = stickers[..., np.newaxis] == np.arange(6, dtype=stickers.dtype)
+    first = np.where(present.any(axis=-2), present.argmax(axis=-2), stickers.shape[-1])
+    mapping = np.empty_like(first)
+    np.put_along_axis(mapping, np.argsort(first, axis=-1), np.arange(6), axis=-1)
+    return np.take_along_axis(mapping, stickers.astype(np.intp), axis=-1).astype(np.uint8)
+
+
+def packStickers(stickers):
+    # Packs colors 0..7 at 3 bits each into uint64 words of 21 stickers, the first sticker in the
+    # highest bits and the last word padded with zeros, so packed rows compare like the stickers
+    words = -(-stickers.shape[-1] // STICKERS_PER_WORD)
+    padded = np.zeros(stickers.shape[:-1] + (words * STICKERS_PER_WORD,), dtype=np.uint64)
+    padded[..., :stickers.shape[-1]] = stickers
+    padded = padded.reshape(stickers.shape[:-1] + (words, STICKERS_PER_WORD))
+    return (padded << WORD_SHIFTS).sum(axis=-1, dtype=np.uint64)
+
+
+def recolor(stickers, symmetries, colors):
+    # Colors of conjugates: stickers (..., count) gathered through symmetryPermutations of the given symmetries
+    if colors:
+        return firstAppearance(stickers)
+    return SYMMETRY_COLORS[symmetries[..., np.newaxis], stickers]
+
+
+def canonicalize(nets, colors=False):
+    # Canonical keys of a stack of nets
+    # nets (array) : (count, 3*size, 4*size) nets, such as CubeBatch.nets
+    # colors (bool) : also ignore relabelings of the colors
+    # Returns (keys, symmetries): the (count, words) big endian uint64 keys, whose bytes compare like the
+    # keys, and for each net the symmetry whose conjugate is the key, so the canonical state is
+    # transformMoves(scramble, symmetry) applied to a solved cube
+    # Only the first word is packed for all 48 conjugates. Colors first seen later cannot change how the
+    # first word is numbered, so that holds with colors too, and the few conjugates tied on it are packed in full
+    nets = np.asarray(nets)
+    size = nets.shape[-1] // 4
+    perms = symmetryPermutations(size)
+    flat = nets.reshape(len(nets), -1)
+    keys = np.empty((len(nets), -(-perms.shape[1] // STICKERS_PER_WORD)), dtype='>u8')
+    symmetries = np.empty(len(nets), dtype=np.intp)
+    allSymmetries = np.arange(48)
+    for start in range(0, len(nets), CHUNK_SIZE):
+        chunk = flat[start:start+CHUNK_SIZE].astype(np.uint8)
+        first = packStickers(recolor(chunk[:, perms[:, :STICKERS_PER_WORD]], allSymmetries, colors))[..., 0]
+        rows, tied = np.nonzero(first == first.min(axis=1)[:, np.newaxis])
+        packed = packStickers(recolor(chunk[rows[:, np.newaxis], perms[tied]], tied, colors))
+        # Tied conjugates sorted by cube and then key, the first of each cube is its smallest
+        order = np.lexsort(tuple(packed.T[::-1]) + (rows,))
+        best = order[np.flatnonzero(np.diff(rows[order], prepend=-1))]
+        keys[start:start+CHUNK_SIZE] = packed[best]
+        symmetries[start:start+CHUNK_SIZE] = tied[best]
+    return keys, symmetries
+
+
+def canonicalKey(cube, colors=False):
+    # Canonical key of one Cube as bytes, see canonicalize
+    return canonicalize(cube.net[np.newaxis], colors)[0][0].tobytes()
+
+
+def canonicalKeys(cubes, colors=False):
+    # Canonical keys of a CubeBatch, a list of Cubes or a stack of nets as a (count, words) array, see canonicalize
+    if isinstance(cubes, CubeBatch):
+        nets = cubes.nets
+    elif len(cubes) and isinstance(cubes[0], Cube):
+        nets = np.stack([cube.net for cube in cubes])
+    else:
+        nets = cubes
+    return canonicalize(nets, colors)[0]
+
+
+def dedupe(cubes, colors=False):
+    # Groups states that are equal up to symmetry
+    # cubes : as for canonicalKeys
+    # Returns (first, inverse): the index of the first state of every group, in order, and the group of each
+    # state, so states[first] holds one of each and states[first][inverse] matches states up to symmetry
+    keys = canonicalKeys(cubes, colors)
+    order = np.lexsort(keys.T[::-1])
+    starts = np.ones(len(keys), dtype=bool)
+    starts[1:] = (keys[order[1:]] != keys[order[:-1]]).any(axis=1)
+    groups = np.cumsum(starts) - 1
+    first = order[starts]
+    # Number the groups by their first state
+    rank = np.empty(len(first), dtype=np.intp)
+    rank[np.argsort(first)] = np.arange(len(first))
+    inverse = np.empty(len(keys), dtype=np.intp)
+    inverse[order] = rank[groups]
+    return np.sort(first), inverse
+
+
+if __name__ == '__main__':
+    import time
+    batch = CubeBatch(3, 100000)
+    batch.scramble(4, seed=1)
+    t0 = time.time()
+    first, inverse = dedupe(batch)
+    seconds = time.time() - t0
+    print(str(len(batch)) + ' states after 4 random moves, ' + str(len(first)) + ' up to symmetry, in ' + str(round(seconds, 2)) + ' s')
+    cube = batch.getCube(0)
+    t0 = time.time()
+    for i in range(1000):
+        canonicalKey(cube)
+    print(str(round((time.time() - t0) * 1000)) + ' us per single key')
@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+
+# Generation and storage of the move and pruning tables used by the solvers
+# Tables are built once, saved in TABLE_DIR as .npy files, or as versioned .tbl and .dist files (see the
+# header format below), and memory-mapped on later runs
+#
+# Worker processes share one copy of the tables. A solver module hands out picklable handles with
+# tableHandles() and workers attach to them with useTables(handles), for example
+#   pool = multiprocessing.Pool(initializer=twophase.useTables, initargs=(twophase.tableHandles(),))
+# Attaching maps the same memory again, nothing is copied or unpickled
+
+import atexit
+import mmap
+import multiprocessing
+import os
+import struct
+from multiprocessing import shared_memory
+
+import numpy as np
+
+TABLE_DIR = os.environ.get('RUBIKS_TABLE_DIR', os.path.join(os.path.dirname(os.path.realpath(__file__)), 'tables'))
+
+# Distance stored for states that have not been reached
+UNVISITED = 255
+# The same for tables packed two states per byte
+UNVISITED_NIBBLE = 15
+
+
+def tablePath(name):
+    return os.path.join(TABLE_DIR, name + '.npy')
+
+
+def loadTable(name, build, version=None):
+    # Returns the table saved under name, memory-mapped read only, building and saving it first if needed
+    # name (str) : file name without extension
+    # build (function) : called with no arguments to make the table when it is not on disk yet
+    # version (int) : kept in a table file with the header of distance files, and rebuilt when it holds another
+    #   version. None for a plain .npy file
+    if version is not None:
+        return loadVersionedTable(name, version, build)
+    path = tablePath(name)
+    if not os.path.exists(path):
+        os.makedirs(TABLE_DIR, exist_ok=True)
+        table = build()
+        # Write to a temporary file first so an interrupted build never leaves a truncated table behind
+        temporary = path + '.' + str(os.getpid()) + '.tmp'
+        with open(temporary, 'wb') as file:
+            np.save(file, table)
+        os.replace(temporary, path)
+    return np.load(path, mmap_mode='r')
+
+
+def breadthFirst(numStates, expand, start, chunkSize=1 << 20):
+    # Distance of every state from the start states, found by expanding whole frontiers at once
+    # numStates (int) : states are numbered 0..numStates-1
+    # expand (function) : maps an array of states to an array of all their neighbours (any shape)
+    # start (int or array) : states at distance 0
+    # chunkSize (int) : frontier states expanded together, bounds the memory used for neighbours
+    # Returns a uint8 array with UNVISITED for states that cannot be reached
+    distances = np.full(numStates, UNVISITED, dtype=np.uint8)
+    frontier = np.unique(np.atleast_1d(start))
+    distances[frontier] = 0
+    depth = 0
+    while len(frontier):
+        depth += 1
+        for i in range(0, len(frontier), chunkSize):
+            neighbours = np.asarray(expand(frontier[i:i+chunkSize])).ravel()
+            # Repeated neighbours are simply written twice, the next frontier is read back from distances
+            distances[neighbours[distances[neighbours] == UNVISITED]] = depth
+        frontier = np.flatnonzero(distances == depth)
+    return distances
+
+
+def packNibbles(distances):
+    # Packs distances below 16 two per byte, the even state in the low half. UNVISITED becomes UNVISITED_NIBBLE
+    distances = np.minimum(distances, UNVISITED_NIBBLE).astype(np.uint8)
+    if len(distances) % 2:
+        distances = np.append(distances, UNVISITED_NIBBLE)
+    return distances[0::2] | (distances[1::2] << 4)
+
+
+def unpackNibbles(packed, states):
+    # Distances of an array of states from a packed table
+    states = np.asarray(states)
+    return (np.asarray(packed)[states >> 1] >> ((states & 1) << 2)) & 15
+
+
+def sortedUnique(values):
+    # np.unique for large integer arrays, sorting in place instead of hashing
+    values = np.sort(values)
+    return values[np.concatenate([[True], values[1:] != values[:-1]])] if len(values) else values
+
+
+def markNibbles(packed, states, value):
+    # Sets the distance of sorted, distinct states in a packed table. States sharing a byte are combined
+    # first since a fancy assignment keeps only one write per byte
+    states = np.asarray(states, dtype=np.int64)
+    if not len(states):
+        return
+    byteIndex = states >> 1
+    shifts = ((states & 1) << 2).astype(np.uint8)
+    starts = np.flatnonzero(np.concatenate([[True], byteIndex[1:] != byteIndex[:-1]]))
+    keep = np.bitwise_and.reduceat(~(np.uint8(15) << shifts), starts)
+    bits = np.bitwise_or.reduceat(np.uint8(value) << shifts, starts)
+    byteIndex = byteIndex[starts]
+    packed[byteIndex] = (packed[byteIndex] & keep) | bits
+
+
+class ProductSpace:
+    # States made of independent coordinates, each with a move table of shape (count, moves). A state is
+    # numbered in mixed radix with the first coordinate most significant, like perm*NUM_TWIST + twist.
+    # Instances are picklable so they can be sent to generateDistances workers
+    def __init__(self, *moveTables):
+        self.moveTables = [np.asarray(table, dtype=np.int64) for table in moveTables]
+        self.counts = [len(table) for table in self.moveTables]
+        self.numStates = int(np.prod(self.counts))
+
+    def __call__(self, states):
+        # (len(states), moves) array of neighbours
+        neighbours, stride = 0, 1
+        for table, count in zip(self.moveTables[::-1], self.counts[::-1]):
+            neighbours = neighbours + table[states % count] * stride
+            states = states // count
+            stride *= count
+        return neighbours
+
+
+# Shared table and expand function of a generateDistances worker process
+workerState = None
+
+
+def initWorker(name, numStates, expand):
+    global workerState
+    memory = shared_memory.SharedMemory(name=name)
+    workerState = (memory, np.ndarray(((numStates + 1) // 2,), dtype=np.uint8, buffer=memory.buf), expand)
+
+
+def expandChunk(states):
+    # New states one move away from a chunk of the frontier, sorted and without repeats. Reads of the
+    # shared table may be stale, so the parent checks the states again before marking them
+    memory, packed, expand = workerState
+    neighbours = np.asarray(expand(states.astype(np.int64))).ravel()
+    return sortedUnique(neighbours[unpackNibbles(packed, neighbours) == UNVISITED_NIBBLE])
+
+
+def generateDistances(numStates, expand, start, processes=None, chunkSize=1 << 18):
+    # Nibble packed distance of every state from the start states (see packNibbles), built one frontier
+    # at a time. Frontier chunks are expanded by a pool of processes that read the table from shared memory,
+    # while this process marks the new states
+    # numStates (int) : states are numbered 0..numStates-1
+    # expand (picklable function) : maps an int64 array of states to an array of all their neighbours,
+    #   such as a ProductSpace or a module level function
+    # start (int or array) : states at distance 0
+    # processes (int) : worker processes, all cores if None and none at all if 1
+    # chunkSize (int) : frontier states sent to a worker at once
+    # Raises ValueError if a state is 15 or more moves away, since the distance would not fit in 4 bits
+    global workerState
+    processes = processes or os.cpu_count() or 1
+    stateType = np.uint32 if numStates <= 1 << 32 else np.int64
+    memory = shared_memory.SharedMemory(create=True, size=(numStates + 1) // 2) if processes > 1 else None
+    pool = None
+    try:
+        if memory is None:
+            packed = np.empty((numStates + 1) // 2, dtype=np.uint8)
+            workerState = (None, packed, expand)
+        else:
+            packed = np.ndarray(((numStates + 1) // 2,), dtype=np.uint8, buffer=memory.buf)
+            pool = multiprocessing.Pool(processes, initializer=initWorker, initargs=(memory.name, numStates, expand))
+        packed[:] = UNVISITED_NIBBLE * 17
+        frontier = sortedUnique(np.atleast_1d(start)).astype(stateType)
+        markNibbles(packed, frontier, 0)
+        depth = 0
+        while len(frontier):
+            depth += 1
+            chunks = (frontier[i:i+chunkSize] for i in range(0, len(frontier), chunkSize))
+            found = []
+            for states in (map(expandChunk, chunks) if pool is None else pool.imap_unordered(expandChunk, chunks)):
+                states = states[unpackNibbles(packed, states) == UNVISITED_NIBBLE]
+                if len(states) and depth >= UNVISITED_NIBBLE:
+                    raise ValueError('States more than ' + str(UNVISITED_NIBBLE - 1) + ' moves away do not fit in 4 bits')
+                markNibbles(packed, states, depth)
+                found.append(states.astype(stateType))
+            frontier = np.concatenate(found) if found else frontier[:0]
+        return np.array(packed)
+    finally:
+        workerState = None
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        if memory is not None:
+            del packed
+            memory.close()
+            memory.unlink()
+
+
+# Distance files hold a packed table behind a fixed 64 byte header:
+#   magic (8 bytes), format (uint16), bits per state (uint16), table version (uint32), state count (uint64)
+# The version is chosen by the code that builds the table and is bumped whenever its coordinates change,
+# so stale files are rebuilt instead of being misread
+DISTANCE_MAGIC = b'RBKDIST\0'
+DISTANCE_FORMAT = 1
+DISTANCE_HEADER = struct.Struct('<8sHHIQ')
+DISTANCE_HEADER_SIZE = 64
+
+
+def distancePath(name):
+    return os.path.join(TABLE_DIR, name + '.dist')
+
+
+def saveDistances(path, packed, numStates, version):
+    # Writes a nibble packed table (see packNibbles) to path atomically
+    # packed (array or iterable of arrays) : the table, or consecutive blocks of it so it never has to be in memory at once
+    blocks = [packed] if isinstance(packed, np.ndarray) else packed
+    header = DISTANCE_HEADER.pack(DISTANCE_MAGIC, DISTANCE_FORMAT, 4, version, numStates)
+    temporary = path + '.' + str(os.getpid()) + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(header.ljust(DISTANCE_HEADER_SIZE, b'\0'))
+        for block in blocks:
+            file.write(np.ascontiguousarray(block, dtype=np.uint8).data)
+    os.replace(temporary, path)
+
+
+def openDistances(path, numStates=None, version=None):
+    # Memory-maps the packed distances of a distance file, read only
+    # Raises ValueError when the file is not a distance file or does not match numStates or version
+    with open(path, 'rb') as file:
+        header = file.read(DISTANCE_HEADER.size)
+    if len(header) < DISTANCE_HEADER.size:
+        raise ValueError(path + ' is not a distance file')
+    magic, fileFormat, bits, fileVersion, fileStates = DISTANCE_HEADER.unpack(header)
+    if magic != DISTANCE_MAGIC or fileFormat != DISTANCE_FORMAT or bits != 4:
+        raise ValueError(path + ' is not a distance file')
+    if (numStates is not None and fileStates != numStates) or (version is not None and fileVersion != version):
+        raise ValueError(path + ' holds table version ' + str(fileVersion) + ' with ' + str(fileStates) + ' states')
+    return np.memmap(path, dtype=np.uint8, mode='r', offset=DISTANCE_HEADER_SIZE, shape=((fileStates + 1) // 2,))
+
+
+# Table files hold an .npy array behind the same header, with their own magic, the bits of an element and
+# the number of elements
+TABLE_MAGIC = b'RBKTABL\0'
+
+
+def versionedTablePath(name):
+    return os.path.join(TABLE_DIR, name + '.tbl')
+
+
+def saveVersionedTable(path, table, version):
+    # Writes an array to a table file atomically
+    table = np.asarray(table)
+    header = DISTANCE_HEADER.pack(TABLE_MAGIC, DISTANCE_FORMAT, table.dtype.itemsize * 8, version, table.size)
+    temporary = path + '.' + str(os.getpid()) + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(header.ljust(DISTANCE_HEADER_SIZE, b'\0'))
+        np.save(file, table)
+    os.replace(temporary, path)
+
+
+def openVersionedTable(path, version=None):
+    # Memory-maps the array of a table file, read only
+    # Raises ValueError when the file is not a table file or does not match version
+    with open(path, 'rb') as file:
+        header = file.read(DISTANCE_HEADER_SIZE)
+        if len(header) < DISTANCE_HEADER_SIZE:
+            raise ValueError(path + ' is not a table file')
+        magic, fileFormat, bits, fileVersion, count = DISTANCE_HEADER.unpack(header[:DISTANCE_HEADER.size])
+        if magic != TABLE_MAGIC or fileFormat != DISTANCE_FORMAT:
+            raise ValueError(path + ' is not a table file')
+        if version is not None and fileVersion != version:
+            raise ValueError(path + ' holds table version ' + str(fileVersion))
+        if np.lib.format.read_magic(file) == (1, 0):
+            shape, fortranOrder, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortranOrder, dtype = np.lib.format.read_array_header_2_0(file)
+        offset = file.tell()
+    if dtype.itemsize * 8 != bits or int(np.prod(shape)) != count:
+        raise ValueError(path + ' is not a table file')
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape, order='F' if fortranOrder else 'C')
+
+
+def loadVersionedTable(name, version, build):
+    # loadTable for table files, rebuilding files written by another version
+    path = versionedTablePath(name)
+    try:
+        return openVersionedTable(path, version)
+    except (OSError, ValueError):
+        pass
+    os.makedirs(TABLE_DIR, exist_ok=True)
+    saveVersionedTable(path, build(), version)
+    return openVersionedTable(path, version)
+
+
+def loadDistances(name, version, numStates, build):
+    # Like loadTable for nibble packed distance tables, rebuilding files written by another version
+    # build (function) : called with no arguments, returns the packed distances (see generateDistances)
+    path = distancePath(name)
+    try:
+        return openDistances(path, numStates, version)
+    except (OSError, ValueError):
+        pass
+    os.makedirs(TABLE_DIR, exist_ok=True)
+    saveDistances(path, build(), numStates, version)
+    return openDistances(path, numStates, version)
+
+
+# shared_memory blocks created by this process for TableHandle, unlinked when it exits
+sharedBlocks = []
+# Blocks attached by this process, kept open while their arrays are in use
+attachedBlocks = {}
+
+
+class TableHandle:
+    # Picklable reference to a read only table that other processes attach to without copying it.
+    # Tables memory-mapped from a file are mapped again from the same file, any other array is copied
+    # once into a named multiprocessing.shared_memory block owned by the process making the handle
+    def __init__(self, array):
+        self.shape, self.dtype = array.shape, array.dtype.str
+        if isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap) and array.filename is not None:
+            self.path, self.offset, self.name = array.filename, array.offset, None
+        else:
+            memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)[...] = array
+            if not sharedBlocks:
+                atexit.register(unlinkSharedBlocks, os.getpid())
+            sharedBlocks.append(memory)
+            self.path, self.offset, self.name = None, 0, memory.name
+
+    def attach(self):
+        if self.name is None:
+            return np.memmap(self.path, dtype=self.dtype, mode='r', offset=self.offset, shape=self.shape)
+        if self.name not in attachedBlocks:
+            attachedBlocks[self.name] = shared_memory.SharedMemory(name=self.name)
+        array = np.ndarray(self.shape, dtype=self.dtype, buffer=attachedBlocks[self.name].buf)
+        array.flags.writeable = False
+        return array
+
+
+def unlinkSharedBlocks(pid):
+    # Forked children inherit the list but the blocks belong to the parent
+    if os.getpid() == pid:
+        for memory in sharedBlocks:
+            memory.close()
+            memory.unlink()
+        sharedBlocks.clear()
+
+
+def shareTables(loaded):
+    # TableHandles for a dict, list or tuple of tables, keeping its structure
+    if isinstance(loaded, dict):
+        return {key: shareTables(value) for key, value in loaded.items()}
+    if isinstance(loaded, (list, tuple)):
+        return type(loaded)(shareTables(value) for value in loaded)
+    return TableHandle(np.asarray(loaded) if not isinstance(loaded, np.ndarray) else loaded)
+
+
+def attachTables(handles):
+    # Inverse of shareTables in another process
+    if isinstance(handles, dict):
+        return {key: attachTables(value) for key, value in handles.items()}
+    if isinstance(handles, (list, tuple)):
+        return type(handles)(attachTables(value) for value in handles)
+    return handles.attach()
@@ -0,0 +1,25 @@
+import pytest
+
+from cube import Cube, FaceCube
+
+
+@pytest.mark.parametrize('cubeType', [Cube, FaceCube])
+@pytest.mark.parametrize('size', [2, 3, 4, 5])
+def test_sexyMoveOrder(cubeType, size):
+    # (R U R' U') has order 6, which only holds when U, F, D and B turn the right way round
+    for algorithm in ("R U R' U'", "F D F' D'", "L B L' B'", "U F U' F'"):
+        cube = cubeType(size)
+        for i in range(5):
+            cube.apply(algorithm)
+            assert not cube.isSolved()
+        cube.apply(algorithm)
+        assert cube.isSolved()
+
+
+@pytest.mark.parametrize('size', [2, 3, 4, 5])
+def test_faceCubeMatchesCube(size):
+    cube, faceCube = Cube(size), FaceCube(size)
+    moves = "R U2 F' D B2 L' 2R Uw' 3F2" if size > 3 else "R U2 F' D B2 L'"
+    cube.apply(moves)
+    faceCube.apply(moves)
+    assert (cube.net == faceCube.net).all()
@@ -0,0 +1,90 @@
+import pytest
+
+import anytime
+import cross
+import optimal
+import peephole
+import solver
+import solver2x2
+import twophase
+from cube import CubeBatch
+from cubie import MOVE_NAMES
+
+
+def assertSolves(solve, size=3, count=10, length=30, seed=1, solved=lambda cube: cube.isSolved()):
+    # Scrambles count cubes, solves each with solve(cube) and checks that applying the moves it returns
+    # leaves the cube solved. Returns the lengths of the solutions
+    # solved (function) : what solved means, the whole cube by default
+    batch = CubeBatch(size, count)
+    batch.scramble(length, seed=seed)
+    lengths = []
+    for i in range(count):
+        solution = solve(batch.getCube(i))
+        check = batch.getCube(i)
+        check.apply(solution)
+        assert solved(check), 'cube ' + str(i) + ' is not solved by ' + ' '.join(solution)
+        lengths.append(len(solution))
+    return lengths
+
+
+def crossSolved(cube, slots=()):
+    # True when the cross edges, and the corner and edge of each F2L slot, are in place and oriented
+    corners, edges = cross.pieceStates(cube)
+    return (all(edges[piece] == cross.SOLVED_EDGES[piece] for piece in cross.CROSS_EDGES) and
+            all(corners[cross.SLOT_CORNERS[slot]] == cross.SOLVED_CORNERS[cross.SLOT_CORNERS[slot]] and
+                edges[cross.SLOT_EDGES[slot]] == cross.SOLVED_EDGES[cross.SLOT_EDGES[slot]] for slot in slots))
+
+
+def test_twophase():
+    assert max(assertSolves(twophase.solve, count=20)) <= 21
+
+
+def test_solver2x2():
+    # Every 2x2 is solved in at most 11 face turns
+    assert max(assertSolves(solver2x2.solve, size=2, count=100)) <= 11
+
+
+def test_optimal():
+    # Optimal solutions are never longer than the scramble
+    assert all(moves <= 12 for moves in assertSolves(optimal.solve, count=3, length=12))
+
+
+@pytest.mark.parametrize('xcross, optimize', [(False, False), (True, False), (False, True)])
+def test_cfop(xcross, optimize):
+    assertSolves(lambda cube: solver.solve(cube, xcross, optimize))
+
+
+def test_cross():
+    lengths = assertSolves(lambda cube: [MOVE_NAMES[move] for move in cross.solveCross(cross.pieceStates(cube)[1])], count=50, solved=crossSolved)
+    # Every cross takes at most 8 moves
+    assert max(lengths) <= 8
+
+
+def test_xcross():
+    def solveXCross(cube):
+        slot, moves = cross.solveXCross(*cross.pieceStates(cube))
+        slots.append(slot)
+        return [MOVE_NAMES[move] for move in moves]
+    slots = []
+    assertSolves(solveXCross, count=5, solved=lambda cube: crossSolved(cube, slots[-1:]))
+
+
+def test_peephole():
+    def solveAndOptimize(cube):
+        moves = solver.solve(cube)
+        shorter = peephole.optimize(moves)
+        assert len(shorter) <= len(moves)
+        return shorter
+    assertSolves(solveAndOptimize)
+
+
+@pytest.mark.parametrize('deadline', [0, 100])
+def test_anytime(deadline):
+    assertSolves(lambda cube: anytime.solve(cube, deadline), count=5)
+
+
+def test_anytimeImproves():
+    batch = CubeBatch(3, 1)
+    batch.scramble(30, seed=1)
+    lengths = [len(moves) for moves in anytime.solutions(batch.getCube(0), 300)]
+    assert lengths and lengths == sorted(lengths, reverse=True) and len(set(lengths)) == len(lengths)
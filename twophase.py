@@ -0,0 +1,480 @@
+#!/usr/bin/env python
+
+# Two-phase (Kociemba) solver for 3x3 cubes
+# Phase 1 brings the cube into the group <U, D, R2, L2, F2, B2>, where every piece is oriented and
+# the E-slice edges are in the E-slice. Phase 2 solves it with only those moves. Both phases are
+# IDA* searches over coordinates, using move and pruning tables kept on disk by tables.py. Both search
+# whole arrays of nodes a level at a time with numpy rather than one node per Python call, and phase 2
+# continues from every phase 1 solution of a length at once
+# Phase 1 is pruned by its exact distance: the flip, slice and twist coordinates are folded by the 16
+# symmetries keeping the UD axis into 64,430 flipslice classes times 2187 twists, a 70 MB table
+
+import time
+from functools import lru_cache
+
+import numpy as np
+
+import tables
+from cubie import (MOVE_CORNERS, MOVE_EDGES, MOVE_NAMES, CubieCube, cubiesToNets, edgeGroupMoveTable, multiplyCubies, netsToCubies, partialPermutationFromRank,
+                   partialPermutationRank, permutationFromRank, permutationRank)
+from symmetry import SYMMETRY_SIDES, conjugateNets
+
+# Bump when a coordinate or table layout changes so old files are rebuilt
+TABLE_VERSION = 1
+
+NUM_TWIST = 2187
+NUM_FLIP = 2048
+NUM_SLICE = 495
+NUM_PERM8 = 40320
+NUM_SLICE_SORTED = 24
+# Placements of 4 edges in 12 slots, and in the 8 U and D slots
+NUM_EDGE_GROUP = 11880
+NUM_UD_GROUP = 1680
+# The symmetries keeping the U and D sides on the UD axis (see symmetry.SYMMETRIES), the identity first.
+# They map phase 1 and its moves onto themselves
+UD_SYMMETRIES = np.flatnonzero(SYMMETRY_SIDES[:, 0] % 3 == 0)
+# slice*NUM_FLIP + flip, and its classes under UD_SYMMETRIES
+NUM_FLIPSLICE = NUM_SLICE * NUM_FLIP
+NUM_FLIPSLICE_CLASS = 64430
+
+# Moves kept in phase 2 as indices into MOVE_NAMES: U U2 U' D D2 D' F2 R2 B2 L2
+PHASE2_MOVES = [0, 1, 2, 9, 10, 11, 4, 7, 13, 16]
+
+# Moves allowed after a move on each face (index lastFace + 1): never the same face twice in a row,
+# and opposite faces only in one order since they commute
+PHASE1_NEXT = [[(move, move // 3) for move in range(18) if move // 3 != lastFace and move // 3 + 3 != lastFace] for lastFace in range(-1, 6)]
+# The same as masks of the allowed moves, and whether each move is a phase 2 move
+PHASE1_ALLOWED = np.array([[move // 3 != lastFace and move // 3 + 3 != lastFace for move in range(18)] for lastFace in range(-1, 6)])
+PHASE2_ALLOWED = PHASE1_ALLOWED[:, PHASE2_MOVES]
+PHASE2_MOVES_ARRAY = np.array(PHASE2_MOVES)
+IS_PHASE2_MOVE = np.isin(np.arange(18), PHASE2_MOVES)
+# Nodes expanded at once, bounding the memory of deep searches
+CHUNK = 4096
+
+# Sets of 4 out of 12 edge positions in increasing order, the slice coordinate is the rank of the set holding the E-slice edges
+SLICE_MASKS = np.array([mask for mask in range(4096) if bin(mask).count('1') == 4])
+SLICE_RANK = np.full(4096, -1)
+SLICE_RANK[SLICE_MASKS] = np.arange(NUM_SLICE)
+SOLVED_SLICE = int(SLICE_RANK[0xF00])
+
+SOLVED_CORNERS = np.arange(8) * 3
+SOLVED_EDGES = np.arange(12) * 2
+
+# Coordinates of cubie states, all taking and returning arrays
+
+
+def twistCoordinate(corners):
+    return (corners[..., :7] % 3) @ (3 ** np.arange(6, -1, -1))
+
+
+def flipCoordinate(edges):
+    return (edges[..., :11] % 2) @ (2 ** np.arange(10, -1, -1))
+
+
+def sliceCoordinate(edges):
+    return SLICE_RANK[(edges // 2 >= 8) @ (1 << np.arange(12))]
+
+
+def cornerPermCoordinate(corners):
+    return permutationRank(corners // 3)
+
+
+def udEdgeCoordinate(edges):
+    # Permutation of the 8 U and D layer edges, only meaningful in phase 2
+    return permutationRank(edges[..., :8] // 2)
+
+
+def sliceSortedCoordinate(edges):
+    # Permutation of the 4 E-slice edges, only meaningful in phase 2
+    return permutationRank(edges[..., 8:] // 2 - 8)
+
+
+def edgeGroupCoordinate(edges, first):
+    # Placement of the 4 edge pieces first..first+3 (UR..UB, DR..DB or FR..BR), their slots ranked by
+    # cubie.partialPermutationRank. Unlike udEdge and sliceSorted it is defined in phase 1 too, so phase 2
+    # starts from these, carried through the phase 1 moves by one move table
+    slots = np.argsort(edges // 2, axis=-1)[..., first:first+4]
+    return partialPermutationRank(slots, 12)
+
+
+# Cubie states with a given coordinate and everything else solved, used to build the move tables
+
+
+def twistCubies(twists):
+    digits = twists[:, np.newaxis] // (3 ** np.arange(6, -1, -1)) % 3
+    co = np.concatenate([digits, (-digits.sum(axis=1, keepdims=True)) % 3], axis=1)
+    return SOLVED_CORNERS + co, np.broadcast_to(SOLVED_EDGES, (len(twists), 12))
+
+
+def flipCubies(flips):
+    digits = flips[:, np.newaxis] // (2 ** np.arange(10, -1, -1)) % 2
+    eo = np.concatenate([digits, digits.sum(axis=1, keepdims=True) % 2], axis=1)
+    return np.broadcast_to(SOLVED_CORNERS, (len(flips), 8)), SOLVED_EDGES + eo
+
+
+def sliceCubies(slices):
+    inSlice = (SLICE_MASKS[slices][:, np.newaxis] >> np.arange(12)) & 1
+    # Slice edges fill the marked positions in order and the other edges fill the rest
+    ep = np.where(inSlice, 8 + np.cumsum(inSlice, axis=1) - 1, np.cumsum(1 - inSlice, axis=1) - 1)
+    return np.broadcast_to(SOLVED_CORNERS, (len(slices), 8)), ep * 2
+
+
+def flipSliceCubies(flipSlices):
+    corners, edges = sliceCubies(flipSlices // NUM_FLIP)
+    return corners, edges + flipCubies(flipSlices % NUM_FLIP)[1] % 2
+
+
+def cornerPermCubies(perms):
+    return permutationFromRank(perms, 8) * 3, np.broadcast_to(SOLVED_EDGES, (len(perms), 12))
+
+
+def udEdgeCubies(perms):
+    ep = np.concatenate([permutationFromRank(perms, 8), np.broadcast_to(np.arange(8, 12), (len(perms), 4))], axis=1)
+    return np.broadcast_to(SOLVED_CORNERS, (len(perms), 8)), ep * 2
+
+
+def sliceSortedCubies(perms):
+    ep = np.concatenate([np.broadcast_to(np.arange(8), (len(perms), 8)), permutationFromRank(perms, 4) + 8], axis=1)
+    return np.broadcast_to(SOLVED_CORNERS, (len(perms), 8)), ep * 2
+
+
+def moveTable(cubies, coordinate, count, moves=range(18)):
+    # Table of coordinate after each move, shaped (count, len(moves))
+    # cubies (function) : coordinate values -> cubie states
+    # coordinate (function) : cubie states -> coordinate values
+    corners, edges = cubies(np.arange(count))
+    table = np.empty((count, len(moves)), dtype=np.uint16)
+    for i, move in enumerate(moves):
+        table[:, i] = coordinate(*multiplyCubies(corners, edges, MOVE_CORNERS[move], MOVE_EDGES[move]))
+    return table
+
+
+def conjugateCubies(corners, edges, symmetry):
+    # Cubie states conjugated by one of symmetry.SYMMETRIES. Going through the nets keeps reflections, whose
+    # corner twists have no cubie rule here, as simple as rotations
+    return netsToCubies(conjugateNets(cubiesToNets(corners, edges), symmetry))
+
+
+def twistConjugateTable():
+    # Twist of the conjugate by each of UD_SYMMETRIES, shaped (NUM_TWIST, 16). Those symmetries keep the U and D
+    # stickers of corners on U and D, so it does not depend on the rest of the state
+    corners, edges = twistCubies(np.arange(NUM_TWIST))
+    return np.stack([twistCoordinate(conjugateCubies(corners, edges, symmetry)[0]) for symmetry in UD_SYMMETRIES], axis=1).astype(np.uint16)
+
+
+def flipSliceConjugates(flipSlices):
+    # slice*NUM_FLIP + flip of the conjugates by UD_SYMMETRIES, shaped (len(flipSlices), 16)
+    corners, edges = flipSliceCubies(flipSlices)
+    conjugates = np.empty((len(flipSlices), len(UD_SYMMETRIES)), dtype=np.int64)
+    for i, symmetry in enumerate(UD_SYMMETRIES):
+        conjugated = conjugateCubies(corners, edges, symmetry)[1]
+        conjugates[:, i] = sliceCoordinate(conjugated) * NUM_FLIP + flipCoordinate(conjugated)
+    return conjugates
+
+
+@lru_cache(maxsize=None)
+def flipSliceClassTables():
+    # (flipSliceClass, flipSliceSymmetry, flipSliceRepresentative). Each class is represented by the smallest
+    # slice*NUM_FLIP + flip among the conjugates of its members, and numbered in order of it:
+    #   flipSliceClass           class of every flipslice
+    #   flipSliceSymmetry        index into UD_SYMMETRIES of a symmetry conjugating it into the representative
+    #   flipSliceRepresentative  representative of every class
+    flipSliceClass = np.empty(NUM_FLIPSLICE, dtype=np.uint16)
+    flipSliceSymmetry = np.empty(NUM_FLIPSLICE, dtype=np.uint8)
+    smallest = np.empty(NUM_FLIPSLICE, dtype=np.int64)
+    for first in range(0, NUM_FLIPSLICE, 1 << 16):
+        conjugates = flipSliceConjugates(np.arange(first, min(first + (1 << 16), NUM_FLIPSLICE)))
+        flipSliceSymmetry[first:first + (1 << 16)] = conjugates.argmin(axis=1)
+        smallest[first:first + (1 << 16)] = conjugates.min(axis=1)
+    representatives = np.flatnonzero(smallest == np.arange(NUM_FLIPSLICE))
+    if len(representatives) != NUM_FLIPSLICE_CLASS:
+        raise RuntimeError('Found ' + str(len(representatives)) + ' flipslice classes instead of ' + str(NUM_FLIPSLICE_CLASS))
+    flipSliceClass[:] = np.searchsorted(representatives, smallest)
+    return flipSliceClass, flipSliceSymmetry, representatives.astype(np.uint32)
+
+
+def phase1Index(t, slc, flip, twist):
+    # State of the flipSliceTwist table holding the phase 1 distance of arrays of coordinates
+    # t (dict) : tables, see buildTables
+    flipSlice = slc * NUM_FLIP + flip
+    return t['flipSliceClass'][flipSlice].astype(np.int64) * NUM_TWIST + t['twistConjugate'][twist, t['flipSliceSymmetry'][flipSlice]]
+
+
+class FlipSliceTwistSpace:
+    # Neighbours of the flipSliceTwist states, class*NUM_TWIST + twist, for tables.generateDistances
+    def __init__(self, t):
+        # int64 so that slice*NUM_FLIP does not overflow
+        self.t = {name: np.asarray(t[name], dtype=np.int64) for name in ('sliceMoves', 'flipMoves', 'twistMoves')}
+        self.t.update((name, np.asarray(t[name])) for name in ('flipSliceClass', 'flipSliceSymmetry', 'twistConjugate'))
+        self.representatives = np.asarray(t['flipSliceRepresentative'], dtype=np.int64)
+
+    def __call__(self, states):
+        t = self.t
+        flipSlice, twist = self.representatives[states // NUM_TWIST], states % NUM_TWIST
+        return phase1Index(t, t['sliceMoves'][flipSlice // NUM_FLIP], t['flipMoves'][flipSlice % NUM_FLIP], t['twistMoves'][twist])
+
+
+def buildFlipSliceTwistDistances(t):
+    # Packed phase 1 distances of the flipSliceTwist states
+    packed = tables.generateDistances(NUM_FLIPSLICE_CLASS * NUM_TWIST, FlipSliceTwistSpace(t), phase1Index(t, SOLVED_SLICE, 0, 0))
+    # A representative left alone by some symmetries has several states per position, the twists those symmetries
+    # exchange. The search only reaches some of them, so all of them get the smallest distance found
+    representatives = np.asarray(t['flipSliceRepresentative'], dtype=np.int64)
+    symmetric = np.flatnonzero((flipSliceConjugates(representatives)[:, 1:] == representatives[:, np.newaxis]).any(axis=1))
+    states = symmetric[:, np.newaxis] * NUM_TWIST + np.arange(NUM_TWIST)
+    distances = tables.unpackNibbles(packed, states)
+    fixed = flipSliceConjugates(representatives[symmetric]) == representatives[symmetric, np.newaxis]
+    for i in range(1, len(UD_SYMMETRIES)):
+        rows = np.flatnonzero(fixed[:, i])
+        conjugated = symmetric[rows, np.newaxis] * NUM_TWIST + np.asarray(t['twistConjugate'])[:, i]
+        distances[rows] = np.minimum(distances[rows], tables.unpackNibbles(packed, conjugated))
+    for distance in np.unique(distances):
+        tables.markNibbles(packed, states[distances == distance], distance)
+    return packed
+
+
+def phase2Lookups():
+    # (udGroupIndex, udEdgeMerge, sliceSortedFromGroup), turning edge group coordinates into phase 2 ones:
+    #   udGroupIndex          the U or D group placement as 0..NUM_UD_GROUP-1 when within the 8 U and D slots
+    #   udEdgeMerge           udEdge at udGroupIndex[U group] * NUM_UD_GROUP + udGroupIndex[D group]
+    #   sliceSortedFromGroup  sliceSorted of the E-slice group when within the E-slice
+    udGroupIndex = np.full(NUM_EDGE_GROUP, -1, dtype=np.int32)
+    udGroupIndex[partialPermutationRank(partialPermutationFromRank(np.arange(NUM_UD_GROUP), 8, 4), 12)] = np.arange(NUM_UD_GROUP)
+    edges = np.concatenate([permutationFromRank(np.arange(NUM_PERM8), 8), np.broadcast_to(np.arange(8, 12), (NUM_PERM8, 4))], axis=1) * 2
+    udEdgeMerge = np.full(NUM_UD_GROUP * NUM_UD_GROUP, NUM_PERM8, dtype=np.uint16)
+    udEdgeMerge[udGroupIndex[edgeGroupCoordinate(edges, 0)] * NUM_UD_GROUP + udGroupIndex[edgeGroupCoordinate(edges, 4)]] = np.arange(NUM_PERM8)
+    edges = sliceSortedCubies(np.arange(NUM_SLICE_SORTED))[1]
+    sliceSortedFromGroup = np.full(NUM_EDGE_GROUP, NUM_SLICE_SORTED, dtype=np.uint8)
+    sliceSortedFromGroup[edgeGroupCoordinate(edges, 8)] = np.arange(NUM_SLICE_SORTED)
+    return udGroupIndex, udEdgeMerge, sliceSortedFromGroup
+
+
+def pruningTable(firstMoves, secondMoves, start):
+    # Distance to start of every pair of coordinates, stored at first*len(secondMoves) + second
+    size = len(secondMoves)
+    return tables.breadthFirst(len(firstMoves) * size, lambda states: firstMoves[states // size] * size + secondMoves[states % size], start)
+
+
+def buildTables():
+    # Loads every table, building the missing ones. Returns a dict of arrays
+    t = {}
+    t['twistMoves'] = tables.loadTable('twophase_twist_moves', lambda: moveTable(twistCubies, lambda c, e: twistCoordinate(c), NUM_TWIST), TABLE_VERSION)
+    t['flipMoves'] = tables.loadTable('twophase_flip_moves', lambda: moveTable(flipCubies, lambda c, e: flipCoordinate(e), NUM_FLIP), TABLE_VERSION)
+    t['sliceMoves'] = tables.loadTable('twophase_slice_moves', lambda: moveTable(sliceCubies, lambda c, e: sliceCoordinate(e), NUM_SLICE), TABLE_VERSION)
+    t['cornerMoves'] = tables.loadTable('twophase_corner_moves', lambda: moveTable(cornerPermCubies, lambda c, e: cornerPermCoordinate(c), NUM_PERM8), TABLE_VERSION)
+    t['udEdgeMoves'] = tables.loadTable('twophase_udedge_moves', lambda: moveTable(udEdgeCubies, lambda c, e: udEdgeCoordinate(e), NUM_PERM8, PHASE2_MOVES), TABLE_VERSION)
+    t['sliceSortedMoves'] = tables.loadTable('twophase_slicesorted_moves', lambda: moveTable(sliceSortedCubies, lambda c, e: sliceSortedCoordinate(e), NUM_SLICE_SORTED, PHASE2_MOVES),
+                                             TABLE_VERSION)
+    t['edgeGroupMoves'] = tables.loadTable('twophase_edge_group_moves', lambda: (edgeGroupMoveTable(4) >> 4).astype(np.uint16), TABLE_VERSION)
+    t['udGroupIndex'], t['udEdgeMerge'], t['sliceSortedFromGroup'] = phase2Lookups()
+
+    for i, name in enumerate(('flipSliceClass', 'flipSliceSymmetry', 'flipSliceRepresentative')):
+        t[name] = tables.loadTable('twophase_' + name.lower(), lambda: flipSliceClassTables()[i], TABLE_VERSION)
+    t['twistConjugate'] = tables.loadTable('twophase_twist_conjugate', twistConjugateTable, TABLE_VERSION)
+    t['flipSliceTwistDistances'] = tables.loadDistances('twophase_flipslice_twist', TABLE_VERSION, NUM_FLIPSLICE_CLASS * NUM_TWIST, lambda: buildFlipSliceTwistDistances(t))
+    sliceSortedMoves = np.asarray(t['sliceSortedMoves'], dtype=np.int64)
+    t['cornerSlicePrune'] = tables.loadTable('twophase_corner_slice_prune', lambda: pruningTable(np.asarray(t['cornerMoves'], dtype=np.int64)[:, PHASE2_MOVES], sliceSortedMoves, 0),
+                                             TABLE_VERSION)
+    t['edgeSlicePrune'] = tables.loadTable('twophase_edge_slice_prune', lambda: pruningTable(np.asarray(t['udEdgeMoves'], dtype=np.int64), sliceSortedMoves, 0), TABLE_VERSION)
+    return t
+
+
+loadedTables = None
+
+
+def getTables():
+    # Tables are loaded on first use and shared by every search in the process
+    global loadedTables
+    if loadedTables is None:
+        loadedTables = buildTables()
+    return loadedTables
+
+
+def flatView(table):
+    # memoryview over a table for fast scalar lookups at row*columns + column
+    table = np.ascontiguousarray(table)
+    return memoryview(table).cast('B').cast(table.dtype.char)
+
+
+def tableHandles():
+    # Picklable handles to the tables for worker processes, see useTables
+    return tables.shareTables(getTables())
+
+
+def useTables(handles):
+    # Attaches tables shared by another process through tableHandles, for example as a pool initializer
+    global loadedTables
+    loadedTables = tables.attachTables(handles)
+
+
+class Search:
+    def __init__(self, corners, edges, maxLength, deadline, anySolution=True, maxPhase2=18):
+        # corners, edges (uint8 arrays) : cubie state to solve
+        # maxLength (int) : the search stops at the first solution with at most this many moves
+        # deadline (float) : time.time() after which the best solution so far is returned
+        # anySolution (bool) : keep searching past the deadline until some solution is found. When False
+        #   run() may return None at the deadline
+        # maxPhase2 (int) : longest phase 2 searched. Every phase 2 takes at most 18 moves, a lower limit skips
+        #   the deep phase 2 searches that slow down finding the first solutions
+        # Plain arrays, indexing memory-mapped ones is slower
+        self.tables = {name: np.asarray(table) for name, table in getTables().items()}
+        edges = np.asarray(edges)
+        self.coordinates = np.array([[twistCoordinate(corners)], [flipCoordinate(edges)], [sliceCoordinate(edges)], [cornerPermCoordinate(corners)]] +
+                                    [[edgeGroupCoordinate(edges, first)] for first in (0, 4, 8)], dtype=np.int64)
+        self.maxLength = maxLength
+        self.deadline = deadline
+        self.anySolution = anySolution
+        self.maxPhase2 = maxPhase2
+        self.best = None
+        self.lengthLimit = 30
+        self.untilSolution = False
+        self.done = False
+
+    def run(self):
+        # Returns the shortest solution found as a list of move indices, or None
+        t = self.tables
+        twist, flip, slc = self.coordinates[:3]
+        start = int(tables.unpackNibbles(t['flipSliceTwistDistances'], phase1Index(t, slc, flip, twist))[0])
+        # Only solutions within maxLength first, so that no phase 2 searches deeper than they could be
+        self.search(start, self.maxLength)
+        if self.best is None and self.anySolution:
+            # None by the deadline, or none that short: any solution, then shorter ones until the deadline.
+            # Any cube is solved in 12 phase 1 and 18 phase 2 moves
+            self.done = False
+            self.untilSolution = True
+            self.search(start, 30)
+        return self.best
+
+    def search(self, start, lengthLimit):
+        # Phase 1 searches of increasing depth for solutions within lengthLimit moves, shorter than the best so far
+        self.lengthLimit = min(lengthLimit, 30)
+        for depth in range(start, self.lengthLimit+1):
+            if self.done or (self.best is not None and depth >= len(self.best)):
+                break
+            self.phase1(self.coordinates, np.empty((1, 0), dtype=np.int64), depth)
+
+    def timeUp(self):
+        if time.time() > self.deadline and (self.best is not None or not self.untilSolution):
+            self.done = True
+        return self.done
+
+    def phase1(self, coordinates, paths, depth):
+        # Phase 1 over arrays of nodes, depth first over chunks of CHUNK of them
+        # coordinates ((7, n) int64 array) : twist, flip, slice, corner permutation and U, D and E-slice edge groups of each node
+        # paths ((n, length) int64 array) : moves reaching each node
+        # depth (int) : moves left to reach phase 2
+        if depth == 0:
+            # A phase 1 ending in a phase 2 move would also be found one move shorter
+            if paths.shape[1]:
+                keep = ~IS_PHASE2_MOVE[paths[:, -1]]
+                coordinates, paths = coordinates[:, keep], paths[keep]
+            self.startPhase2(coordinates, paths)
+            return
+        coordinates, paths = self.expand(coordinates, paths, depth)
+        for first in range(0, len(paths), CHUNK):
+            if self.timeUp():
+                return
+            self.phase1(coordinates[:, first:first+CHUNK], paths[first:first+CHUNK], depth-1)
+
+    def expand(self, coordinates, paths, depth):
+        # Children of phase 1 nodes that reach phase 2 in depth-1 more moves
+        t = self.tables
+        lastFaces = paths[:, -1] // 3 if paths.shape[1] else np.full(len(paths), -1)
+        parents, moves = np.nonzero(PHASE1_ALLOWED[lastFaces + 1])
+        twist = t['twistMoves'][coordinates[0, parents], moves].astype(np.int64)
+        flip = t['flipMoves'][coordinates[1, parents], moves].astype(np.int64)
+        slc = t['sliceMoves'][coordinates[2, parents], moves].astype(np.int64)
+        keep = tables.unpackNibbles(t['flipSliceTwistDistances'], phase1Index(t, slc, flip, twist)) < depth
+        parents, moves = parents[keep], moves[keep]
+        children = np.array([twist[keep], flip[keep], slc[keep], t['cornerMoves'][coordinates[3, parents], moves]] +
+                            [t['edgeGroupMoves'][coordinates[row, parents], moves] for row in (4, 5, 6)], dtype=np.int64)
+        return children, np.concatenate([paths[parents], moves[:, np.newaxis]], axis=1)
+
+    def startPhase2(self, coordinates, paths):
+        # Phase 2 from phase 1 solutions of one length, all of them at once by increasing phase 2 depth
+        t = self.tables
+        corner, uEdges, dEdges, sliceEdges = coordinates[3:]
+        udGroupIndex = t['udGroupIndex']
+        udEdge = t['udEdgeMerge'][udGroupIndex[uEdges] * NUM_UD_GROUP + udGroupIndex[dEdges]].astype(np.int64)
+        sliceSorted = t['sliceSortedFromGroup'][sliceEdges].astype(np.int64)
+        coordinates = np.array([corner, udEdge, sliceSorted])
+        starts = np.maximum(t['cornerSlicePrune'][corner*24 + sliceSorted], t['edgeSlicePrune'][udEdge*24 + sliceSorted])
+        limit = min((len(self.best) - 1 if self.best is not None else self.lengthLimit) - paths.shape[1], self.maxPhase2)
+        for depth in range(int(starts.min(initial=limit+1)), limit+1):
+            keep = starts <= depth
+            if self.phase2(coordinates[:, keep], paths[keep], depth) or self.done:
+                return
+
+    def phase2(self, coordinates, paths, depth):
+        # Phase 2 over arrays of nodes as phase1, coordinates being corner permutation, udEdge and sliceSorted.
+        # Returns True once a solution is found
+        if depth == 0:
+            solved = np.flatnonzero((coordinates == 0).all(axis=0))
+            if len(solved) == 0:
+                return False
+            self.best = paths[solved[0]].tolist()
+            if len(self.best) <= self.maxLength:
+                self.done = True
+            return True
+        t = self.tables
+        lastFaces = paths[:, -1] // 3 if paths.shape[1] else np.full(len(paths), -1)
+        parents, moves = np.nonzero(PHASE2_ALLOWED[lastFaces + 1])
+        corner = t['cornerMoves'][coordinates[0, parents], PHASE2_MOVES_ARRAY[moves]].astype(np.int64)
+        sliceSorted = t['sliceSortedMoves'][coordinates[2, parents], moves].astype(np.int64)
+        keep = t['cornerSlicePrune'][corner*24 + sliceSorted] < depth
+        parents, moves, corner, sliceSorted = parents[keep], moves[keep], corner[keep], sliceSorted[keep]
+        udEdge = t['udEdgeMoves'][coordinates[1, parents], moves].astype(np.int64)
+        keep = t['edgeSlicePrune'][udEdge*24 + sliceSorted] < depth
+        parents, moves = parents[keep], moves[keep]
+        coordinates = np.array([corner[keep], udEdge[keep], sliceSorted[keep]])
+        paths = np.concatenate([paths[parents], PHASE2_MOVES_ARRAY[moves, np.newaxis]], axis=1)
+        for first in range(0, len(paths), CHUNK):
+            if self.timeUp():
+                return False
+            if self.phase2(coordinates[:, first:first+CHUNK], paths[first:first+CHUNK], depth-1):
+                return True
+        return False
+
+
+def verify(corners, edges):
+    # Raises ValueError when a cubie state cannot be reached by turning a real cube
+    cp, ep = corners // 3, edges // 2
+    if sorted(cp.tolist()) != list(range(8)) or sorted(ep.tolist()) != list(range(12)):
+        raise ValueError('Cube has missing or repeated pieces')
+    if (corners % 3).sum() % 3 != 0:
+        raise ValueError('Cube has a twisted corner')
+    if (edges % 2).sum() % 2 != 0:
+        raise ValueError('Cube has a flipped edge')
+    if parity(cp) != parity(ep):
+        raise ValueError('Cube has two swapped pieces')
+
+
+def parity(perm):
+    perm = list(perm)
+    swaps = 0
+    for i in range(len(perm)):
+        while perm[i] != i:
+            j = perm[i]
+            perm[i], perm[j] = perm[j], perm[i]
+            swaps += 1
+    return swaps % 2
+
+
+def solve(cube, maxLength=21, timeout=10.0):
+    # Solves a 3x3 cube.Cube or cubie.CubieCube, returning the moves as a list such as ['R', "U'", 'F2']
+    # maxLength (int) : stop at the first solution this short
+    # timeout (float) : seconds after which the shortest solution found so far is returned instead
+    state = cube if isinstance(cube, CubieCube) else CubieCube.fromCube(cube)
+    verify(state.corners, state.edges)
+    search = Search(state.corners, state.edges, maxLength, time.time() + timeout)
+    return [MOVE_NAMES[move] for move in search.run()]
+
+
+if __name__ == '__main__':
+    from cube import CubeBatch
+    getTables()
+    batch = CubeBatch(3, 1)
+    batch.scramble(30, seed=1)
+    t0 = time.time()
+    solution = solve(batch.getCube(0))
+    print(' '.join(solution) + ' (' + str(len(solution)) + ' moves in ' + str(round(1000*(time.time()-t0), 1)) + ' ms)')